@@ -1,79 +1,103 @@
 import feedparser
-import requests
-import re
-import csv
+import logging
 from bs4 import BeautifulSoup
+from fetcher import create_session
+from http_cache import HTTPCache
+from retry import fetch_with_retry
+from classifier import FundingClassifier
+from dedupe import FingerprintStore, entry_digest, entry_key
+from records import ARTICLE_FIELDS, Article
+from sinks import CSVSink
+from company_names import CompanyNameExtractor
+from instrumentation import instrumented_run, metrics
+
+log = logging.getLogger(__name__)
 
 # URL of TechCrunch RSS feed
 rss_url = "https://techcrunch.com/feed/"
 
-# parse feed
-feed = feedparser.parse(rss_url)
-
-#list to hold articles
-articles = []
-
 # Defining key word search
 funding_keywords = ["funding", "raises", "series", "seed", "investment", "raised", "valuation", "round"]
 currency_symbols = ["€", "$"]
+classifier = FundingClassifier(funding_keywords, currency_symbols)
+funding_verbs = ["raises", "secures", "lands", "gets", "closes"]
+company_extractor = CompanyNameExtractor(funding_verbs)
 
-# Loop through each entry in the feed
-for entry in feed.entries:
-    title = entry.title
+# Function to fetch and parse the feed through the local HTTP cache, so an unchanged
+# feed costs a 304
+def fetch_feed(url=rss_url):
+    session = create_session(1, cache=HTTPCache())
+    response = fetch_with_retry(url, session)
+    return feedparser.parse(response.content if response else b"")
+
+# Function to clean and classify one feed entry, returning its article record if it matches
+def classify_entry(entry):
+    title = entry.get('title', '')
     summary = entry.get('summary', '')
-    link = entry.link
-    published_date = entry.published
- 
-    
+
     # Remove HTML tags
-    summary = BeautifulSoup(summary, "html.parser").get_text()
+    with metrics.timer('parse_seconds', func='html_to_text'):
+        summary = BeautifulSoup(summary, "html.parser").get_text()
 
-# Search for keywords
-    found_keywords = [keyword for keyword in funding_keywords if re.search(r'\b' + re.escape(keyword) + r'\b', summary, re.IGNORECASE)]
-    found_currency = any(symbol in summary for symbol in currency_symbols)
+    # Search for keywords
+    found_keywords, found_currency = classifier.classify(summary)
 
-# Print and export articles
+    # Print and export articles
     if found_keywords and found_currency:
         # Extract company name from title
-        company_name = ""
-        funding_verbs = ["raises", "secures", "lands", "gets", "closes"]
-        
-        # Find the first funding verb in the title
-        verb_match = re.search(r'\b(' + '|'.join(funding_verbs) + r')\b', title, re.IGNORECASE)
-        if verb_match:
-            verb_position = verb_match.start()
-            # Look for capitalized words before the verb
-            name_match = re.findall(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', title[:verb_position])
-            if name_match:
-                company_name = name_match[-1]  # Take the last match, closest to the verb
+        company_name = company_extractor.extract(title)
 
         if not company_name:
-            print(f"Could not extract company name from title: {title}")
-
-        articles.append({
-            "Title": title,
-            "Company Name": company_name,
-            "Published Date": entry.published,
-            "Link": entry.link,
-            "Summary": summary,
-            "Found Keywords": ", ".join(found_keywords)
-        })
-        print(f"Matched article: {title}")
-        print(f"Company Name: {company_name}")
-        print(f"Keywords found: {', '.join(found_keywords)}")
-        print("---")
-
-print(f"Total articles found: {len(articles)}")
-
-if articles:  # Check if any articles were found
+            log.debug("Could not extract company name from title: %s", title)
+
+        article = Article(title, company_name, entry.get('published', ''), entry.get('link', ''), summary,
+                          ", ".join(found_keywords))
+        log.debug("Matched article: %s | company: %s | keywords: %s", title, company_name, ", ".join(found_keywords))
+        return article
+    return None
+
+# Function to yield the matching articles of feed entries. Entries whose GUID and content
+# match an earlier run reuse that run's result instead of being cleaned and classified
+# again, or are skipped altogether with new_only; the caller commits `fingerprints`.
+def classify_entries(entries, fingerprints, new_only=False):
+    for entry in entries:
+        key, digest = entry_key(entry), entry_digest(entry)
+        seen, article = fingerprints.lookup('rss-entry', key, digest)
+        if seen and new_only:
+            continue
+        if not seen:
+            article = classify_entry(entry)
+            fingerprints.record('rss-entry', key, digest, article.to_dict() if article else None)
+        elif article:
+            article = Article.from_dict(article)
+        if article:
+            yield article
+
+def main():
+    # parse feed
+    feed = fetch_feed()
+
+    company_extractor.use_known_companies()
+
+    # Matched articles are streamed to the CSV as they are classified; the file is only
+    # created (and replaced) once the first article matches
     csv_file = "funding_articles.csv"
-    with open(csv_file, "w", newline="", encoding="utf-8") as csvfile:
-        fieldnames = ["Title", "Company Name", "Published Date", "Link", "Summary", "Found Keywords"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    sink = CSVSink(csv_file, ARTICLE_FIELDS, append=False)
+
+    # Loop through each entry in the feed, writing every matching article
+    fingerprints = FingerprintStore()
+    for article in classify_entries(feed.entries, fingerprints):
+        sink.write(article)
+    fingerprints.close()
+    sink.close()
+
+    log.info("Total articles found: %d", sink.written)
 
-        writer.writeheader()
-        writer.writerows(articles)
+    if sink.written:  # Check if any articles were found
+        log.info("Data has been successfully written to %s", csv_file)
+    else:
+        log.info("No articles found matching the keywords.")
 
-    print(f"Data has been successfully written to {csv_file}")
-else:
-    print("No articles found matching the keywords.")
\ No newline at end of file
+if __name__ == '__main__':
+    with instrumented_run():
+        main()
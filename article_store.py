@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import sqlite3
+
+from instrumentation import metrics
+from records import Article
+from dates import iso_day
+from search_index import ARTICLE_SEARCH_COLUMNS, ensure_day_column, ensure_index
+
+log = logging.getLogger(__name__)
+
+# Default location of the TechCrunch article store, and the JSON file it replaces
+DEFAULT_ARTICLES_DB = "techcrunch_articles.db"
+LEGACY_JSON_DATABASE = "articles_database.json"
+
+# Article columns in Article field order, and the insert statement of an article row
+ARTICLE_COLUMNS = "title, company_name, published_date, link, summary, found_keywords"
+INSERT_ARTICLE = (f"INSERT INTO articles ({ARTICLE_COLUMNS}, published_day) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                  "ON CONFLICT(link) DO NOTHING")
+
+
+# Function to build the row INSERT_ARTICLE stores for an article, with its day (YYYY-MM-DD)
+def article_row(article):
+    return (*article, iso_day(article.published_date))
+
+
+# Indexed SQLite store of scraped articles. Membership checks are primary-key lookups,
+# so nothing is loaded into memory up front, and each article is committed as soon as
+# it is added so a crash loses at most the article in progress.
+class ArticleStore:
+    def __init__(self, path=DEFAULT_ARTICLES_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS articles
+                             (title TEXT, company_name TEXT, published_date TEXT,
+                              link TEXT PRIMARY KEY, summary TEXT, found_keywords TEXT)''')
+        self.conn.commit()
+        # Indexed day of each article, and a full-text index kept current by triggers
+        ensure_day_column(self.conn, 'articles', 'published_date', 'published_day')
+        ensure_index(self.conn, 'articles', ARTICLE_SEARCH_COLUMNS)
+
+    def __contains__(self, link):
+        return self.conn.execute("SELECT 1 FROM articles WHERE link=?", (link,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    # Insert Articles not already stored, returning how many were new
+    def add_many(self, articles):
+        with metrics.timer('db_insert_seconds', table='articles'), self.conn:
+            cursor = self.conn.executemany(INSERT_ARTICLE, map(article_row, articles))
+        added = cursor.rowcount  # Rows inserted by the statement itself, not by the index triggers
+        metrics.inc('db_rows_inserted_total', added, table='articles')
+        return added
+
+    def add(self, article):
+        return self.add_many([article]) == 1
+
+    def iter_articles(self):
+        for row in self.conn.execute(f"SELECT {ARTICLE_COLUMNS} FROM articles"):
+            yield Article(*row)
+
+    # One-time import of the old JSON database; the file is renamed afterwards so
+    # the migration never runs twice. Returns the number of articles imported.
+    def migrate_json(self, json_path=LEGACY_JSON_DATABASE):
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, 'r') as f:
+            imported = self.add_many([Article.from_dict(article) for article in json.load(f)])
+        os.replace(json_path, json_path + ".migrated")
+        log.info("Migrated %d articles from %s to the article store.", imported, json_path)
+        return imported
+
+    def close(self):
+        self.conn.close()
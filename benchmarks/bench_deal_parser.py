@@ -0,0 +1,72 @@
+# Benchmark the newsletter deal parser against the frozen baseline implementation.
+#
+#   python benchmarks/bench_deal_parser.py [--corpus DIR] [--repeat N]
+#
+# The corpus is a directory of saved newsletter bodies (*.txt), one email per file.
+import argparse
+import contextlib
+import glob
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import deal_parser
+import legacy_deal_parser
+
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus', 'newsletters')
+
+
+# Function to load every saved newsletter body in a directory
+def load_corpus(corpus_dir):
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            bodies.append(f.read())
+    return bodies
+
+
+# Function to parse the corpus `repeat` times, returning (deals, seconds)
+def run(extract, bodies, repeat):
+    deals = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for body in bodies:
+                deals += len(extract(body, '2024-01-01'))
+        elapsed = time.perf_counter() - start
+    return deals, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the newsletter deal parser')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='directory of saved newsletter bodies')
+    parser.add_argument('--repeat', type=int, default=200, help='passes over the corpus')
+    args = parser.parse_args()
+
+    bodies = load_corpus(args.corpus)
+    if not bodies:
+        sys.exit(f"No newsletter bodies found in {args.corpus}")
+
+    # Both parsers must agree before their speed is worth comparing
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for body in bodies:
+            expected = [tuple(deal.values()) for deal in legacy_deal_parser.extract_venture_deals(body, '2024-01-01')]
+            actual = [tuple(deal) for deal in deal_parser.extract_venture_deals(body, '2024-01-01')]
+            if expected != actual:
+                sys.exit("deal_parser output differs from the baseline parser")
+
+    print(f"Corpus: {len(bodies)} newsletters, {args.repeat} passes")
+    results = {}
+    for name, extract in [('baseline', legacy_deal_parser.extract_venture_deals),
+                          ('deal_parser', deal_parser.extract_venture_deals)]:
+        deals, elapsed = run(extract, bodies, args.repeat)
+        results[name] = deals / elapsed
+        print(f"{name:<12} {deals:>8} deals  {elapsed:8.3f}s  {results[name]:10.0f} deals/sec")
+    print(f"Speedup: {results['deal_parser'] / results['baseline']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
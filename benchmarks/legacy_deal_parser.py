@@ -0,0 +1,126 @@
+# Baseline deal parser, frozen as it was before the single-pass rewrite in
+# deal_parser.py, so benchmarks can report before/after throughput.
+import re
+
+investor_pattern = re.compile(r'([^.]+?)\s*led the round and (?:were|was) joined by\s*(.*?)(?:\.|\s*$)', re.IGNORECASE)
+
+def extract_venture_deals(email_content, deal_date):
+    venture_deals = []
+    
+    if not email_content:
+        print("Email content is empty.")
+        return venture_deals
+
+    # Split the content by newlines
+    lines = email_content.split('\n')
+    start_index = next((i for i, line in enumerate(lines) if 'VENTURE DEALS' in line), -1)
+    if start_index == -1:
+        print("No 'VENTURE DEALS' section found in the email.")
+        return venture_deals
+
+    print("Found 'VENTURE DEALS' section.")
+    deals_text = lines[start_index+1:]
+
+    # Process each deal
+    current_deal = ""
+    for line in deals_text:
+        line = line.strip()
+        if 'PRIVATE EQUITY' in line:
+            print("Reached 'PRIVATE EQUITY' section. Stopping processing for this email.")
+            break
+        if line.startswith('-'):
+            if current_deal:
+                venture_deals.append(parse_deal(current_deal, deal_date))
+            current_deal = line
+        elif line:
+            current_deal += " " + line
+    
+    # Add the last deal if we haven't reached PRIVATE EQUITY
+    if current_deal and 'PRIVATE EQUITY' not in current_deal:
+        venture_deals.append(parse_deal(current_deal, deal_date))
+
+    return venture_deals
+
+def parse_deal(deal_text, deal_date):
+    # Extract company name and URL
+    company_match = re.search(r'-\s*(.*?)\s*<(https?://[^>]+)>', deal_text)
+    if company_match:
+        company_name = company_match.group(1).strip()
+        company_url = company_match.group(2)
+        company_info = deal_text.split('>')[1].strip()  # Get the text after the URL
+    else:
+        company_name = "No company name found"
+        company_url = "No URL found"
+        company_info = deal_text
+
+    # Extract funding amount
+    funding_match = re.search(r'([$€£¥]?[0-9,.]+\s?(?:million|billion))', company_info)
+    funding_amount = funding_match.group(1) if funding_match else "No funding amount found"
+
+    # Extract investors
+    investor_match = investor_pattern.search(company_info)
+    if investor_match:
+        lead_investors = investor_match.group(1).strip()
+        joined_investors = investor_match.group(2).strip()
+        investors = f"{lead_investors}, {joined_investors}"
+    else:
+        # Try to find investors after "funding from" anywhere in the company_info
+        funding_from_match = re.search(r'funding from\s*(.*?)(?=\.\s*[A-Z]|\s*$)', company_info, re.IGNORECASE | re.DOTALL)
+        if funding_from_match:
+            investors = funding_from_match.group(1).strip()
+        else:
+            investors = "No investors found"
+
+    # Process investors
+    if investors != "No investors found":
+        # Remove "and others" and replace "existing investors" with a comma
+        investors = re.sub(r'\s*,?\s*and\s+others?\s*', '', investors, flags=re.IGNORECASE)
+        investors = re.sub(r'\s*,?\s*existing\s+investors?\s*', ',', investors, flags=re.IGNORECASE)
+        # Remove any trailing comma and whitespace
+        investors = investors.rstrip(',').strip()
+        # Split by comma and 'and', then rejoin with commas
+        investors = [inv.strip() for inv in re.split(r',\s*|\s+and\s+', investors) if inv.strip()]
+        
+        # Remove trailing period from the last investor, if present
+        if investors and investors[-1].endswith('.'):
+            investors[-1] = investors[-1].rstrip('.')
+        
+        investors = ', '.join(investors)
+        
+        # Additional step to remove any remaining 'and' and handle commas
+        def replace_and(match):
+            parts = match.group(0).split('and')
+            if len(parts) == 2:
+                before, after = parts
+                before = before.strip().rstrip(',')
+                after = after.strip().lstrip(',')
+                if before and after:
+                    return f"{before}, {after}"
+                elif before:
+                    return before
+                elif after:
+                    return after
+            return match.group(0)  # If we can't split it, return the original string
+
+        investors = re.sub(r'(^|,\s*)and(\s*,|$)', r'\1\2', investors, flags=re.IGNORECASE)  # Remove 'and' at start or end of list
+        investors = re.sub(r'\w*\s*\band\b\s*\w*', replace_and, investors, flags=re.IGNORECASE)
+        
+        # Remove any duplicate commas and leading/trailing commas
+        investors = re.sub(r',\s*,', ',', investors).strip(',').strip()
+
+        # Final check to remove any remaining 'and's
+        def remove_and(investor):
+            # Remove 'and' when it's preceded by a space and followed by a capital letter
+            return re.sub(r'\s+and(?=[A-Z])', ', ', investor)
+
+        investor_list = re.split(r',\s*', investors)
+        investor_list = [remove_and(inv.strip()) for inv in investor_list]
+        investors = ', '.join(filter(None, investor_list))  # filter(None, ...) removes any empty strings
+    
+    return {
+        'company_name': company_name,
+        'url': company_url,
+        'funding': funding_amount,
+        'investors': investors,
+        'deal_date': deal_date
+    }
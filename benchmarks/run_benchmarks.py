@@ -0,0 +1,328 @@
+# Offline benchmark suite for the scraper hot paths. Every benchmark runs against the
+# saved fixtures in benchmarks/corpus, so no network access or credentials are needed.
+#
+#   python benchmarks/run_benchmarks.py                       # run everything
+#   python benchmarks/run_benchmarks.py parse_deal rss_feed   # run some
+#   python benchmarks/run_benchmarks.py --save baseline.json
+#   python benchmarks/run_benchmarks.py --compare baseline.json --tolerance 0.25
+#
+# Each benchmark reports records/sec (passes repeated for at least --min-time seconds)
+# and the peak memory traced during one pass. With --compare, the run fails (exit 1)
+# when a benchmark is slower or uses more memory than the saved results by more than
+# the tolerance, so regressions are caught before they reach the cron jobs.
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+
+# Number of synthetic records written per pass by the ingest benchmarks
+INGEST_RECORDS = 2000
+
+
+# Function to read every fixture matching a pattern under the corpus directory
+def load_fixtures(pattern, mode='rb'):
+    contents = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, pattern))):
+        with open(path, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            contents.append(f.read())
+    if not contents:
+        sys.exit(f"No fixtures found for {pattern} in {CORPUS_DIR}")
+    return contents
+
+
+# Function to read the headlines of the labeled title corpus
+def load_titles():
+    return [line.split('\t')[0] for line in load_fixtures('titles/funding_titles.tsv', 'r')[0].splitlines()
+            if line.strip() and not line.startswith('#')]
+
+
+# Benchmarks: each setup function prepares its inputs once and returns a function that
+# runs one pass over them and returns the number of records processed.
+
+def bench_rss_feed():
+    import feedparser
+    import Web_scraping_python as rss
+    feeds = load_fixtures('rss/*.xml')
+
+    def run():
+        entries = 0
+        for feed in feeds:
+            for entry in feedparser.parse(feed).entries:
+                rss.classify_entry(entry)
+                entries += 1
+        return entries
+    return run
+
+
+def bench_wayback_snapshots():
+    import feedparser
+    import test as wb
+    snapshots = load_fixtures('wayback/*.xml')
+    entries = sum(len(feedparser.parse(snapshot).entries) for snapshot in snapshots)
+
+    def run():
+        for snapshot in snapshots:
+            wb.parse_feed(snapshot)
+        return entries
+    return run
+
+
+def bench_listing_parse():
+    import techcrunch_scrape as tc
+    pages = load_fixtures('techcrunch/listing_page_*.html')
+    return lambda: sum(len(tc.parse_listing(page)) for page in pages)
+
+
+def bench_article_extract():
+    from parsing import extract_article_text
+    articles = load_fixtures('techcrunch/article_*.html')
+
+    def run():
+        for article in articles:
+            extract_article_text(article)
+        return len(articles)
+    return run
+
+
+# Stand-in for a streamed requests response, handing out a fixture in chunks
+class FixtureResponse:
+    def __init__(self, content):
+        self.content = content
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+        self.encoding = 'utf-8'
+        self.url = 'https://techcrunch.com/fixture/'
+        self.from_cache = True  # Keeps the benchmark out of the HTTP byte counters
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def bench_longform_extract():
+    from parsing import extract_article_text
+    articles = load_fixtures('techcrunch/longform/*.html')
+
+    def run():
+        for article in articles:
+            extract_article_text(article)
+        return len(articles)
+    return run
+
+
+def bench_longform_stream():
+    import techcrunch_scrape as tc
+    from parsing import stream_article_text
+    articles = load_fixtures('techcrunch/longform/*.html')
+
+    def run():
+        for article in articles:
+            stream_article_text(FixtureResponse(article), tc.classifier.decided)
+        return len(articles)
+    return run
+
+
+def bench_classification():
+    import techcrunch_scrape as tc
+    import test as wb
+    from parsing import extract_article_text
+    texts = [extract_article_text(article) for article in load_fixtures('techcrunch/article_*.html')]
+    texts += load_titles()
+
+    def run():
+        for text in texts:
+            tc.classifier.classify(text)
+            wb.classifier.classify(text)
+        return len(texts)
+    return run
+
+
+def bench_parse_deal():
+    from deal_parser import extract_venture_deals
+    bodies = load_fixtures('newsletters/*.txt', 'r')
+    return lambda: sum(len(extract_venture_deals(body, '2024-09-02')) for body in bodies)
+
+
+def bench_company_names():
+    import techcrunch_scrape as tc
+    from company_names import CompanyNameExtractor, KnownCompanies
+    titles = load_titles()
+    known = KnownCompanies(load_fixtures('titles/known_companies.txt', 'r')[0].splitlines()[1:])
+    extractor = CompanyNameExtractor(tc.funding_verbs, known)
+
+    def run():
+        for title in titles:
+            extractor.extract_uncached(title)
+        return len(titles)
+    return run
+
+
+def synthetic_articles():
+    from records import Article
+    titles = load_titles()
+    return [Article(titles[i % len(titles)], "", "2024-09-02", f"https://techcrunch.com/2024/09/02/article-{i}/",
+                    titles[i % len(titles)] * 3, "funding, raises") for i in range(INGEST_RECORDS)]
+
+
+# The DB benchmarks write into a fresh temporary directory on every pass
+@contextlib.contextmanager
+def temporary_directory():
+    path = tempfile.mkdtemp(prefix='bench-')
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def bench_article_ingest():
+    from article_store import ArticleStore
+    articles = synthetic_articles()
+
+    def run():
+        with temporary_directory() as directory:
+            store = ArticleStore(os.path.join(directory, 'articles.db'))
+            added = store.add_many(articles)
+            store.close()
+        return added
+    return run
+
+
+def bench_wayback_ingest():
+    import test as wb
+    articles = synthetic_articles()
+
+    def run():
+        with temporary_directory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)  # setup_database() opens articles_database.db in the working directory
+            try:
+                conn = wb.setup_database()
+                added = wb.add_articles_to_db(articles, conn)
+                conn.commit()
+                conn.close()
+            finally:
+                os.chdir(cwd)
+        return added
+    return run
+
+
+def bench_deal_ingest():
+    from deal_parser import extract_venture_deals
+    from deal_store import DealStore
+    from records import Deal
+    bodies = load_fixtures('newsletters/*.txt', 'r')
+    deals = [deal for body in bodies for deal in extract_venture_deals(body, '2024-09-02')]
+    messages = [(f"message-{i}", [Deal(f"{deal.company_name} {i}", *deal[1:]) for deal in deals])
+                for i in range(INGEST_RECORDS // len(deals))]
+
+    def run():
+        with temporary_directory() as directory:
+            store = DealStore(os.path.join(directory, 'deals.db'))
+            added = sum(store.add_deals(message_id, message_deals) for message_id, message_deals in messages)
+            store.close()
+        return added
+    return run
+
+
+BENCHMARKS = {
+    'rss_feed': bench_rss_feed,
+    'wayback_snapshots': bench_wayback_snapshots,
+    'listing_parse': bench_listing_parse,
+    'article_extract': bench_article_extract,
+    'longform_extract': bench_longform_extract,
+    'longform_stream': bench_longform_stream,
+    'classification': bench_classification,
+    'parse_deal': bench_parse_deal,
+    'company_names': bench_company_names,
+    'article_ingest': bench_article_ingest,
+    'wayback_ingest': bench_wayback_ingest,
+    'deal_ingest': bench_deal_ingest,
+}
+
+
+# Function to time passes of run until min_time has elapsed, then trace one more pass
+# for its peak memory. Returns {'records_per_sec': ..., 'peak_kib': ...}.
+def measure(run, min_time):
+    run()  # Warm up caches and lazy imports
+    records = passes = 0
+    start = time.perf_counter()
+    while True:
+        records += run()
+        passes += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'records_per_sec': records / elapsed, 'peak_kib': peak / 1024, 'passes': passes}
+
+
+# Function to list benchmarks that regressed against saved results by more than tolerance
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        saved = baseline.get(name)
+        if not saved:
+            continue
+        if result['records_per_sec'] < saved['records_per_sec'] * (1 - tolerance):
+            found.append(f"{name}: {result['records_per_sec']:.0f} records/sec, was {saved['records_per_sec']:.0f}")
+        if result['peak_kib'] > saved['peak_kib'] * (1 + tolerance):
+            found.append(f"{name}: peak {result['peak_kib']:.0f} KiB, was {saved['peak_kib']:.0f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline scraper benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds to repeat each benchmark for')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown or memory growth before --compare fails (fraction)')
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    print(f"{'benchmark':<20} {'records/sec':>14} {'peak KiB':>10} {'passes':>8}")
+    for name in args.benchmarks or BENCHMARKS:
+        # The scrapers print per record; that output is not part of what is measured
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            run = BENCHMARKS[name]()
+            results[name] = measure(run, args.min_time)
+        result = results[name]
+        print(f"{name:<20} {result['records_per_sec']:>14.0f} {result['peak_kib']:>10.0f} {result['passes']:>8}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import re
+
+from instrumentation import metrics
+
+# Currency symbols recognised by the funding classifiers
+CURRENCY_SYMBOLS = ["€", "$", "£", "¥"]
+
+
+# Matches a whole keyword set in one pass over the text. The keywords are compiled
+# once into a single alternation with one named group per keyword, so every hit in
+# a document is found by a single scan instead of one regex search per keyword.
+# With regex=True the keywords are treated as regular expressions rather than
+# literal words.
+class KeywordMatcher:
+    def __init__(self, keywords, regex=False, flags=re.IGNORECASE):
+        self.keywords = list(keywords)
+        alternatives = []
+        # Longest literals first so a keyword never shadows a longer one sharing its prefix
+        order = range(len(self.keywords)) if regex else sorted(range(len(self.keywords)),
+                                                              key=lambda i: -len(self.keywords[i]))
+        for i in order:
+            pattern = self.keywords[i] if regex else re.escape(self.keywords[i])
+            alternatives.append(f'(?P<k{i}>{pattern})')
+        self.pattern = re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b', flags)
+
+    # Return the keywords found in the text, in the order they were given
+    def find(self, text):
+        hits = {int(match.lastgroup[1:]) for match in self.pattern.finditer(text)}
+        return [self.keywords[i] for i in sorted(hits)]
+
+    def search(self, text):
+        return self.pattern.search(text) is not None
+
+
+# Keyword matcher paired with a currency-symbol check, shared by the funding scrapers
+class FundingClassifier:
+    def __init__(self, keywords, currency_symbols=CURRENCY_SYMBOLS, regex=False):
+        self.matcher = KeywordMatcher(keywords, regex=regex)
+        self.currency_pattern = re.compile('[' + ''.join(re.escape(symbol) for symbol in currency_symbols) + ']')
+
+    def has_currency(self, text):
+        return self.currency_pattern.search(text) is not None
+
+    # True once text has both a funding keyword and a currency symbol, which settles that
+    # an article matches however much more text follows
+    def decided(self, text):
+        return self.matcher.search(text) and self.has_currency(text)
+
+    # Return (found_keywords, found_currency) for a document
+    @metrics.timed('classify_seconds')
+    def classify(self, text):
+        return self.matcher.find(text), self.has_currency(text)
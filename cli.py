@@ -0,0 +1,89 @@
+# Single entry point for the scrapers and tools.
+#
+#   python cli.py rss                     # Web_scraping_python.py
+#   python cli.py techcrunch              # techcrunch_scrape.py
+#   python cli.py wayback --start 2024-09-01 --end 2024-09-05
+#   python cli.py gmail                   # email_scrape.py
+#   python cli.py pipeline all --format parquet
+#   python cli.py poll --feeds feeds.txt
+#   python cli.py link-deals --window 10
+#   python cli.py usd venture_deals.csv
+#   python cli.py search --investor "sequoia capital" --since 2024-09-01
+#
+# Only the standard library is imported up front; each command imports its module (and
+# with it feedparser, BeautifulSoup, the Google client libraries, ...) when it runs, so
+# `--help`, argument errors and cron wrappers checking the CLI start instantly.
+import argparse
+import importlib
+
+from dates import day_argument
+
+# Scraper commands: module whose main() the command runs, and its help text
+SCRIPTS = {
+    'rss': ('Web_scraping_python', "collect funding articles from the TechCrunch RSS feed"),
+    'techcrunch': ('techcrunch_scrape', "scrape new articles from the TechCrunch venture category"),
+    'wayback': ('test', "backfill funding articles from Wayback Machine snapshots of the feed"),
+    'gmail': ('email_scrape', "sync venture deals from the newsletter emails in Gmail"),
+}
+
+# Tool commands with their own options: module whose main(argv) receives the rest of the
+# command line, and its help text
+TOOLS = {
+    'pipeline': ('pipeline', "run sources through the streaming pipeline"),
+    'poll': ('feed_poller', "poll many funding news feeds on adaptive schedules"),
+    'link-deals': ('deal_linking', "link newsletter deals to TechCrunch articles"),
+    'usd': ('money', "add a US-dollar column to a CSV of funding amounts"),
+    'search': ('search_index', "search the scraped articles and deals"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Funding news scrapers and tools.")
+    subparsers = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    for name, (module, help_text) in SCRIPTS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        subparser.add_argument('--metrics-file', help="write run metrics here (.json, or .prom for Prometheus text)")
+        subparser.add_argument('--metrics-interval', type=float, help="also rewrite the metrics file every N seconds")
+        subparser.add_argument('--log-level', help="DEBUG, INFO, WARNING or ERROR (default INFO)")
+        subparser.add_argument('--log-json', action='store_true', default=None, help="log one JSON object per line")
+        if name == 'wayback':
+            subparser.add_argument('--start', type=day_argument, help="first day of the backfill (YYYY-MM-DD)")
+            subparser.add_argument('--end', type=day_argument, help="last day of the backfill (YYYY-MM-DD)")
+        subparser.set_defaults(handler=run_script, module=module)
+
+    for name, (module, help_text) in TOOLS.items():
+        # The tool parses its own options, including -h
+        subparser = subparsers.add_parser(name, help=help_text, add_help=False)
+        subparser.set_defaults(handler=run_tool, module=module)
+    return parser
+
+
+# Function to run one of the scraper scripts' main() inside an instrumented run
+def run_script(args):
+    from instrumentation import instrumented_run
+
+    module = importlib.import_module(args.module)
+    dates = [args.start, args.end] if args.command == 'wayback' else []
+    with instrumented_run(args.metrics_file, args.metrics_interval, args.log_level, args.log_json):
+        module.main(*dates)
+
+
+# Function to hand the rest of the command line to a tool's main(argv)
+def run_tool(args, argv):
+    importlib.import_module(args.module).main(argv)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if args.handler is run_tool:
+        run_tool(args, rest)
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    else:
+        run_script(args)
+
+
+if __name__ == '__main__':
+    main()
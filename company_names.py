@@ -0,0 +1,124 @@
+import csv
+import os
+import re
+from functools import lru_cache
+
+from article_store import ArticleStore
+from deal_parser import PLACEHOLDERS
+from deal_store import DEFAULT_DEALS_DB, DealStore
+
+# Default CSV export of the newsletter deals (email_scrape.py)
+DEFAULT_DEALS_CSV = "venture_deals.csv"
+
+# Number of titles whose extracted names are remembered
+DEFAULT_CACHE_SIZE = 4096
+
+# Matches runs of capitalised words, the candidate company names in a headline
+capitalized_run_pattern = re.compile(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)')
+
+# Words of a name as matched against the index ("OpenAI", "Fin-Tech", "AT&T", "Web3.0")
+name_word_pattern = re.compile(r'\w(?:[\w&+.-]*\w)?')
+
+
+# Function to compile a list of funding verbs into one headline pattern
+def compile_verbs(funding_verbs):
+    return re.compile(r'\b(' + '|'.join(funding_verbs) + r')\b', re.IGNORECASE)
+
+
+# Function to normalise a name into the lowercase word tuple used as an index key
+def name_key(name):
+    return tuple(word.lower() for word in name_word_pattern.findall(name))
+
+
+# Index of company names already known from earlier deals and articles. Names are
+# grouped by their first word, so finding a known name in a title costs one dict
+# lookup per word, however many names the index holds.
+class KnownCompanies:
+    def __init__(self, names=()):
+        self.by_first_word = {}
+        self.count = 0
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, name):
+        if name in PLACEHOLDERS:
+            return  # The deal parser's stand-in for a missing value, not a name
+        key = name_key(name or '')
+        if not key or len(''.join(key)) < 2:
+            return
+        candidates = self.by_first_word.setdefault(key[0], [])
+        if key not in candidates:
+            candidates.append(key)
+            candidates.sort(key=len, reverse=True)  # Longest name wins
+            self.count += 1
+
+    # Return (start, end) of the known name starting closest to the end of text, or None
+    def find_last(self, text):
+        keys = [word.lower() for word in name_word_pattern.findall(text)]
+        for i in range(len(keys) - 1, -1, -1):
+            for candidate in self.by_first_word.get(keys[i], ()):
+                if tuple(keys[i:i + len(candidate)]) == candidate:
+                    # Word positions are only needed for the match itself
+                    words = list(name_word_pattern.finditer(text))
+                    return words[i].start(), words[i + len(candidate) - 1].end()
+        return None
+
+
+# Function to build the known-company index from whichever of these sources exist: the
+# deal store and its CSV export (names parsed from the newsletters) and, optionally, an
+# article database. Article names come from the title heuristic itself, so they are
+# only worth adding once that store has been reviewed.
+def load_known_companies(deals_db=DEFAULT_DEALS_DB, deals_csv=DEFAULT_DEALS_CSV, articles_db=None):
+    known = KnownCompanies()
+    if deals_db and os.path.exists(deals_db):
+        store = DealStore(deals_db)
+        for deal in store.iter_deals():
+            known.add(deal.company_name)
+        store.close()
+    if deals_csv and os.path.exists(deals_csv):
+        with open(deals_csv, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                known.add(row.get('company_name'))
+    if articles_db and os.path.exists(articles_db):
+        store = ArticleStore(articles_db)
+        for article in store.iter_articles():
+            known.add(article.company_name)
+        store.close()
+    return known
+
+
+# Extracts the company name from a funding headline: the capitalised words closest
+# before the first funding verb, unless a known company name sits at least as close
+# to the verb (which also catches names like "OpenAI" or "Mistral AI" that the
+# capitalised-words rule cuts short). Results are memoised per title.
+class CompanyNameExtractor:
+    def __init__(self, funding_verbs, known=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.verb_pattern = compile_verbs(funding_verbs)
+        self.known = known
+        self.extract = lru_cache(maxsize=cache_size)(self.extract_uncached)
+
+    # Replace the known-company index, forgetting names extracted with the old one
+    def use_index(self, known):
+        self.known = known
+        self.extract.cache_clear()
+
+    # Resolve names against the companies already seen in newsletter deals
+    def use_known_companies(self):
+        self.use_index(load_known_companies())
+
+    def extract_uncached(self, title):
+        verb_match = self.verb_pattern.search(title)
+        if not verb_match:
+            return ""
+        prefix = title[:verb_match.start()]
+        name_match = None
+        for name_match in capitalized_run_pattern.finditer(prefix):
+            pass  # Keep the last match, closest to the verb
+        if self.known:
+            span = self.known.find_last(prefix)
+            if span and (name_match is None or span[1] >= name_match.start()):
+                return prefix[span[0]:span[1]]
+        return name_match.group() if name_match else ""
@@ -0,0 +1,36 @@
+import argparse
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+
+# Function to read a YYYY-MM-DD date as a datetime (ValueError if it is not one)
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+# Function to read a YYYY-MM-DD command-line option, so argparse rejects a bad date
+# with a clear message instead of the option being dropped
+def day_argument(value):
+    try:
+        return parse_day(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD") from None
+
+
+# Function to read an article's published date: ISO dates from the category scraper,
+# RFC 822 dates from the RSS and Wayback feeds; None if unreadable
+def parse_published(value):
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parsedate_to_datetime(value).date()
+    except (TypeError, ValueError):
+        return None
+
+
+# Function to read a stored date as YYYY-MM-DD, so date ranges compare as strings
+def iso_day(value):
+    day = parse_published(value)
+    return day.isoformat() if day else None
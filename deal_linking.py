@@ -0,0 +1,217 @@
+# Links newsletter deals (email_scrape.py) to the TechCrunch articles reporting the same
+# round (techcrunch_scrape.py, test.py) and writes one merged deal table.
+#
+#   python deal_linking.py
+#   python deal_linking.py --articles-db techcrunch_articles.db articles_database.db --window 10
+#
+# Deals are indexed by the first letters of their normalised company name and sorted by
+# date, so each article is only compared with deals sharing a name prefix with one of
+# its title words and falling inside the date window, never with every deal.
+import argparse
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from difflib import SequenceMatcher
+
+from article_store import DEFAULT_ARTICLES_DB, ArticleStore
+from company_names import name_key
+from dates import parse_published
+from deal_store import DEFAULT_DEALS_DB, MERGED_DEAL_FIELDS, DealStore
+from money import parse_money
+from instrumentation import instrumented_run
+from sinks import open_sink
+
+log = logging.getLogger(__name__)
+
+# Days either side of a deal's newsletter date in which an article may report it
+DEFAULT_WINDOW_DAYS = 7
+
+# Characters of a name's first word used as its blocking key
+PREFIX_LENGTH = 4
+
+# Minimum name similarity for an article to be linked to a deal
+NAME_THRESHOLD = 0.85
+
+# Amounts further apart than this fraction are different rounds
+AMOUNT_TOLERANCE = 0.1
+
+# Legal-form words dropped from the end of company names
+legal_suffixes = {'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited',
+                  'llc', 'plc', 'gmbh', 'ag', 'sa', 'sas', 'bv', 'oy', 'ab'}
+
+
+# Function to normalise a company name into lowercase words without its legal form
+def normalize_company(name):
+    words = list(name_key(name or ''))
+    while len(words) > 1 and words[-1] in legal_suffixes:
+        words.pop()
+    return tuple(words)
+
+
+# Function to compare two parsed amounts in US dollars: True if they agree, False if
+# they are clearly different rounds, None if either is missing
+def amounts_agree(a, b):
+    if not a or not b or a.usd is None or b.usd is None:
+        return None
+    return abs(a.usd - b.usd) <= AMOUNT_TOLERANCE * max(a.usd, b.usd)
+
+
+# A newsletter deal with its normalised fields and the best article linked to it so far
+class DealEntry:
+    def __init__(self, deal):
+        self.deal = deal
+        self.name = normalize_company(deal.company_name)
+        self.amount = parse_money(deal.funding)
+        self.date = parse_published(deal.deal_date)
+        self.article = None  # (article, published day, parsed amount) of the best match
+        self.score = 0.0
+
+
+# Blocking index of deals: name prefix -> deals sorted by date, with their dates kept in
+# a parallel list so the date window is found by bisection
+class DealIndex:
+    def __init__(self, deals, window_days=DEFAULT_WINDOW_DAYS):
+        self.window = timedelta(days=window_days)
+        self.entries = []
+        blocks = defaultdict(list)
+        for deal in deals:
+            entry = DealEntry(deal)
+            self.entries.append(entry)
+            if entry.name and entry.date:
+                blocks[entry.name[0][:PREFIX_LENGTH]].append(entry)
+        self.blocks = {}
+        for key, entries in blocks.items():
+            entries.sort(key=lambda entry: entry.date)
+            self.blocks[key] = ([entry.date for entry in entries], entries)
+
+    # Deals sharing a block key with keys and dated within the window of day
+    def candidates(self, keys, day):
+        for key in keys:
+            block = self.blocks.get(key)
+            if block:
+                dates, entries = block
+                yield from entries[bisect_left(dates, day - self.window):bisect_right(dates, day + self.window)]
+
+
+# Function to score how well an article's name and title match a deal's normalised name
+def name_score(deal_name, company, title_words):
+    if deal_name == company:
+        return 1.0
+    size = len(deal_name)
+    if any(title_words[i:i + size] == deal_name for i in range(len(title_words) - size + 1)):
+        return 0.9
+    if not company:
+        return 0.0
+    return SequenceMatcher(None, ' '.join(deal_name), ' '.join(company)).ratio()
+
+
+# Function to link each article to the best matching deal in the index. Each deal keeps
+# only its best article; every other article (unmatched, undated, or beaten to its deal
+# by a better match) is yielded as a merged row of its own. The deals, with the article
+# linked to each (if any), are yielded once every article has been seen.
+def merge_deals(index, articles):
+    seen_links = set()
+    for article in articles:
+        if article.link in seen_links:
+            continue  # The same article stored by more than one scraper
+        seen_links.add(article.link)
+        day = parse_published(article.published_date)
+        amount = parse_money(article.title) or parse_money(article.summary)
+        if day is None:
+            yield article_row(article, day, amount)
+            continue
+        company = normalize_company(article.company_name)
+        title_words = name_key(article.title)
+        keys = {word[:PREFIX_LENGTH] for word in title_words}
+        if company:
+            keys.add(company[0][:PREFIX_LENGTH])
+
+        best, best_score = None, NAME_THRESHOLD
+        for entry in index.candidates(keys, day):
+            score = name_score(entry.name, company, title_words)
+            if score < NAME_THRESHOLD:
+                continue
+            agree = amounts_agree(entry.amount, amount)
+            if agree is False:
+                continue
+            score += 0.1 if agree else 0.0
+            score -= abs((day - entry.date).days) / 1000  # Prefer the closest date
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is None or best_score <= best.score:
+            yield article_row(article, day, amount)
+            continue
+        if best.article is not None:
+            yield article_row(*best.article)  # Displaced by this better match
+        best.article, best.score = (article, day, amount), best_score
+
+    for entry in index.entries:
+        deal = entry.deal
+        if entry.article:
+            article, day, _ = entry.article
+            yield (deal.company_name, deal.deal_date, deal.funding, usd(entry.amount), deal.investors, deal.url,
+                   article.title, article.link, day.isoformat(), 'newsletter+techcrunch', round(entry.score, 3))
+        else:
+            yield (deal.company_name, deal.deal_date, deal.funding, usd(entry.amount), deal.investors, deal.url,
+                   '', '', '', 'newsletter', None)
+
+
+# Function to build the merged row of an article linked to no deal; undated articles
+# get an empty date
+def article_row(article, day, amount):
+    date = day.isoformat() if day else ''
+    return (article.company_name, date, amount.text if amount else '', usd(amount), '', '',
+            article.title, article.link, date, 'techcrunch', None)
+
+
+# Function to take the US-dollar value of a parsed amount, if any
+def usd(amount):
+    return amount.usd if amount else None
+
+
+# Function to iterate over the articles of every existing article database
+def iter_all_articles(paths):
+    for path in paths:
+        if not os.path.exists(path):
+            log.warning("Article database %s not found. Skipping.", path)
+            continue
+        store = ArticleStore(path)
+        yield from store.iter_articles()
+        store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Link newsletter deals to TechCrunch articles.")
+    parser.add_argument('--deals-db', default=DEFAULT_DEALS_DB, help="deal store written by email_scrape.py")
+    parser.add_argument('--articles-db', nargs='+', default=[DEFAULT_ARTICLES_DB, 'articles_database.db'],
+                        help="article databases written by the TechCrunch scrapers")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW_DAYS,
+                        help="days either side of a deal in which an article may report it")
+    parser.add_argument('--output', default='merged_deals.csv', help="CSV (or .parquet) export of the merged table")
+    args = parser.parse_args(argv)
+
+    with instrumented_run():
+        link_deals(args.deals_db, args.articles_db, args.window, args.output)
+
+
+# Function to rebuild the merged deal table and export it
+def link_deals(deals_db, articles_dbs, window, output):
+    store = DealStore(deals_db)
+    index = DealIndex(store.iter_deals(), window)
+    written = store.replace_merged_deals(merge_deals(index, iter_all_articles(articles_dbs)))
+    linked = sum(1 for entry in index.entries if entry.article)
+    log.info("Linked %d of %d newsletter deals to articles; %d merged deals.", linked, len(index.entries), written)
+
+    sink = open_sink(output, MERGED_DEAL_FIELDS, append=False)
+    for row in store.iter_merged_deals():
+        sink.write(row)
+    sink.close()
+    log.info("Merged deals have been written to %s", output)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
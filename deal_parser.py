@@ -0,0 +1,158 @@
+import io
+import logging
+import re
+
+from instrumentation import metrics
+from records import Deal
+
+log = logging.getLogger(__name__)
+
+# Section markers in the Term Sheet newsletter
+DEALS_HEADER = 'VENTURE DEALS'
+DEALS_END = 'PRIVATE EQUITY'
+
+# Values stored in place of fields the parser could not find
+NO_COMPANY = "No company name found"
+NO_URL = "No URL found"
+NO_FUNDING = "No funding amount found"
+NO_INVESTORS = "No investors found"
+PLACEHOLDERS = {NO_COMPANY, NO_URL, NO_FUNDING, NO_INVESTORS}
+
+# Patterns are compiled once at import rather than on every deal
+company_pattern = re.compile(r'-\s*(.*?)\s*<(https?://[^>]+)>')
+funding_pattern = re.compile(r'([$€£¥]?[0-9,.]+\s?(?:million|billion))')
+investor_pattern = re.compile(r'([^.]+?)\s*led the round and (?:were|was) joined by\s*(.*?)(?:\.|\s*$)', re.IGNORECASE)
+lead_anchor_pattern = re.compile(r'led the round and (?:were|was) joined by', re.IGNORECASE)
+funding_from_pattern = re.compile(r'funding from\s*(.*?)(?=\.\s*[A-Z]|\s*$)', re.IGNORECASE | re.DOTALL)
+and_others_pattern = re.compile(r'\s*,?\s*and\s+others?\s*', re.IGNORECASE)
+existing_investors_pattern = re.compile(r'\s*,?\s*existing\s+investors?\s*', re.IGNORECASE)
+investor_split_pattern = re.compile(r',\s*|\s+and\s+')
+dangling_and_pattern = re.compile(r'(^|,\s*)and(\s*,|$)', re.IGNORECASE)
+and_word_pattern = re.compile(r'\w*\s*\band\b\s*\w*', re.IGNORECASE)
+duplicate_comma_pattern = re.compile(r',\s*,')
+comma_pattern = re.compile(r',\s*')
+and_before_capital_pattern = re.compile(r'\s+and(?=[A-Z])')
+
+
+# Function to turn "X and Y" into "X, Y" (used as a re.sub callback)
+def replace_and(match):
+    parts = match.group(0).split('and')
+    if len(parts) == 2:
+        before, after = parts
+        before = before.strip().rstrip(',')
+        after = after.strip().lstrip(',')
+        if before and after:
+            return f"{before}, {after}"
+        elif before:
+            return before
+        elif after:
+            return after
+    return match.group(0)  # If we can't split it, return the original string
+
+
+# Function to normalise a raw investor phrase into a comma-separated list
+def clean_investors(investors):
+    # Remove "and others" and replace "existing investors" with a comma
+    investors = and_others_pattern.sub('', investors)
+    investors = existing_investors_pattern.sub(',', investors)
+    # Remove any trailing comma and whitespace
+    investors = investors.rstrip(',').strip()
+    # Split by comma and 'and', then rejoin with commas
+    investor_list = [inv.strip() for inv in investor_split_pattern.split(investors) if inv.strip()]
+
+    # Remove trailing period from the last investor, if present
+    if investor_list and investor_list[-1].endswith('.'):
+        investor_list[-1] = investor_list[-1].rstrip('.')
+
+    investors = ', '.join(investor_list)
+
+    # Remove any remaining 'and' at the start or end of the list, then between names
+    investors = dangling_and_pattern.sub(r'\1\2', investors)
+    investors = and_word_pattern.sub(replace_and, investors)
+
+    # Remove any duplicate commas and leading/trailing commas
+    investors = duplicate_comma_pattern.sub(',', investors).strip(',').strip()
+
+    # Final check: split 'and' preceded by a space and followed by a capital letter
+    investor_list = [and_before_capital_pattern.sub(', ', inv.strip()) for inv in comma_pattern.split(investors)]
+    return ', '.join(filter(None, investor_list))  # filter(None, ...) removes any empty strings
+
+
+# Function to run investor_pattern without retrying its lazy prefix at every offset.
+# A match cannot start before the sentence containing the first "led the round"
+# anchor, so the search begins just after the last period preceding it.
+def search_lead_investors(company_info):
+    anchor = lead_anchor_pattern.search(company_info)
+    if anchor is None:
+        return None
+    start = company_info.rfind('.', 0, anchor.start()) + 1
+    return investor_pattern.search(company_info, start)
+
+
+@metrics.timed('parse_deal_seconds')
+def parse_deal(deal_text, deal_date):
+    # Extract company name and URL
+    company_match = company_pattern.search(deal_text)
+    if company_match:
+        company_name = company_match.group(1).strip()
+        company_url = company_match.group(2)
+        company_info = deal_text.split('>', 2)[1].strip()  # Get the text after the URL
+    else:
+        company_name = NO_COMPANY
+        company_url = NO_URL
+        company_info = deal_text
+
+    # Extract funding amount
+    funding_match = funding_pattern.search(company_info)
+    funding_amount = funding_match.group(1) if funding_match else NO_FUNDING
+
+    # Extract investors
+    investor_match = search_lead_investors(company_info)
+    if investor_match:
+        investors = clean_investors(f"{investor_match.group(1).strip()}, {investor_match.group(2).strip()}")
+    else:
+        # Try to find investors after "funding from" anywhere in the company_info
+        funding_from_match = funding_from_pattern.search(company_info)
+        if funding_from_match:
+            investors = clean_investors(funding_from_match.group(1).strip())
+        else:
+            investors = NO_INVESTORS
+
+    return Deal.interned(company_name, company_url, funding_amount, investors, deal_date)
+
+
+# Function to yield the deal paragraphs of a newsletter body, reading it as a line
+# stream: lines before the VENTURE DEALS header are skipped, each line starting with
+# '-' opens a new deal, and the PRIVATE EQUITY header ends the section
+def iter_deal_texts(lines):
+    in_section = False
+    current_deal = ""
+    for line in lines:
+        if not in_section:
+            in_section = DEALS_HEADER in line
+            if in_section:
+                log.debug("Found 'VENTURE DEALS' section.")
+            continue
+        line = line.strip()
+        if DEALS_END in line:
+            log.debug("Reached 'PRIVATE EQUITY' section. Stopping processing for this email.")
+            break
+        if line.startswith('-'):
+            if current_deal:
+                yield current_deal
+            current_deal = line
+        elif line:
+            current_deal += " " + line
+    if not in_section:
+        log.info("No 'VENTURE DEALS' section found in the email.")
+    elif current_deal:
+        yield current_deal
+
+
+def extract_venture_deals(email_content, deal_date):
+    if not email_content:
+        log.info("Email content is empty.")
+        return []
+    deals = [parse_deal(deal_text, deal_date) for deal_text in iter_deal_texts(io.StringIO(email_content))]
+    metrics.inc('deals_parsed_total', len(deals))
+    return deals
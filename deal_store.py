@@ -0,0 +1,84 @@
+import sqlite3
+
+from deal_parser import NO_URL
+from instrumentation import metrics
+from records import Deal
+from search_index import DEAL_SEARCH_COLUMNS, ensure_day_column, ensure_index
+
+# Default location of the local venture deals store
+DEFAULT_DEALS_DB = "venture_deals.db"
+
+DEAL_COLUMNS = ', '.join(Deal._fields)
+
+# Columns of the merged deal table built by deal_linking.py
+MERGED_DEAL_FIELDS = ['company_name', 'deal_date', 'funding', 'funding_usd', 'investors', 'company_url',
+                      'article_title', 'article_link', 'article_date', 'sources', 'match_score']
+
+
+# Local SQLite store of parsed newsletter deals, the IDs of the messages they came
+# from, and sync checkpoints such as the last Gmail historyId. A deal repeated by later
+# newsletters is stored once. Deals the parser found no company URL for cannot be told
+# apart that way, so their url is stored as NULL, which a UNIQUE constraint never
+# matches: each of them is kept.
+class DealStore:
+    def __init__(self, path=DEFAULT_DEALS_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS deals
+                             (message_id TEXT, company_name TEXT, url TEXT, funding TEXT,
+                              investors TEXT, deal_date TEXT,
+                              UNIQUE (company_name, url, deal_date))''')
+        self.conn.execute("CREATE TABLE IF NOT EXISTS processed_messages (id TEXT PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+        # Deal dates are already YYYY-MM-DD and only need indexing; the full-text index
+        # is kept current by triggers
+        ensure_day_column(self.conn, 'deals', 'deal_date', 'deal_date')
+        ensure_index(self.conn, 'deals', DEAL_SEARCH_COLUMNS)
+
+    def is_processed(self, message_id):
+        return self.conn.execute("SELECT 1 FROM processed_messages WHERE id=?", (message_id,)).fetchone() is not None
+
+    # Record a message's deals and mark it processed in one transaction,
+    # returning the number of deals that were not already stored
+    def add_deals(self, message_id, deals):
+        with metrics.timer('db_insert_seconds', table='deals'), self.conn:
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO deals VALUES (?, ?, ?, ?, ?, ?)",
+                [(message_id, deal.company_name, None if deal.url == NO_URL else deal.url, *deal[2:])
+                 for deal in deals])
+            added = cursor.rowcount  # Rows inserted by the statement itself, not by the index triggers
+            self.conn.execute("INSERT OR IGNORE INTO processed_messages VALUES (?)", (message_id,))
+        metrics.inc('db_rows_inserted_total', added, table='deals')
+        return added
+
+    # Iterate over every stored deal, oldest first
+    def iter_deals(self):
+        cursor = self.conn.execute(f"SELECT {DEAL_COLUMNS} FROM deals ORDER BY deal_date, rowid")
+        for company_name, url, *rest in cursor:
+            yield Deal.interned(company_name, url or NO_URL, *rest)
+
+    # Rebuild the merged deal table from rows (tuples in MERGED_DEAL_FIELDS order) in one
+    # transaction, returning the number of rows written
+    def replace_merged_deals(self, rows):
+        placeholders = ', '.join('?' * len(MERGED_DEAL_FIELDS))
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS merged_deals")
+            self.conn.execute(f"CREATE TABLE merged_deals ({', '.join(MERGED_DEAL_FIELDS)})")
+            return self.conn.executemany(f"INSERT INTO merged_deals VALUES ({placeholders})", rows).rowcount
+
+    def iter_merged_deals(self):
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='merged_deals'").fetchone():
+            return
+        yield from self.conn.execute("SELECT * FROM merged_deals ORDER BY deal_date, company_name")
+
+    def get_state(self, key):
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (key, str(value)))
+
+    def close(self):
+        self.conn.close()
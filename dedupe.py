@@ -0,0 +1,66 @@
+import hashlib
+import json
+import sqlite3
+
+# Default location of the fingerprint store
+DEFAULT_FINGERPRINT_DB = "fingerprints.db"
+
+# Value stored for records whose result nobody needs to keep
+NO_RESULT = None
+
+
+# Function to hash any number of text fields into one content fingerprint
+def content_digest(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((part or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# Function to build a stable identity for a feed entry: its GUID, else its link
+def entry_key(entry):
+    return entry.get('id') or entry.get('link', '')
+
+
+# Function to fingerprint a feed entry's content as published (before any cleaning)
+def entry_digest(entry):
+    return content_digest(entry.get('title'), entry.get('summary'))
+
+
+# Persistent record of what has already been processed. Each record is identified
+# by (kind, key), e.g. ('wayback-entry', guid), and remembers the content digest it
+# had when processed plus an optional JSON result, so unchanged content can be
+# skipped or its earlier result reused without re-parsing or re-classifying it.
+class FingerprintStore:
+    def __init__(self, path=DEFAULT_FINGERPRINT_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS fingerprints
+                             (kind TEXT, key TEXT, digest TEXT, result TEXT,
+                              PRIMARY KEY (kind, key))''')
+        self.conn.commit()
+
+    # Return (seen, result): seen is True only if the key was recorded with this digest
+    def lookup(self, kind, key, digest):
+        row = self.conn.execute("SELECT digest, result FROM fingerprints WHERE kind=? AND key=?",
+                                (kind, key)).fetchone()
+        if row is None or row[0] != digest:
+            return False, None
+        return True, json.loads(row[1]) if row[1] is not None else None
+
+    def seen(self, kind, key, digest=''):
+        return self.lookup(kind, key, digest)[0]
+
+    # Remember a key's digest and result; call commit() to persist a batch of records
+    def record(self, kind, key, digest='', result=NO_RESULT):
+        self.conn.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                          (kind, key, digest, json.dumps(result) if result is not None else None))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -1,21 +1,29 @@
+import logging
 import os
-import re
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 import base64
-from bs4 import BeautifulSoup
+import json
 from datetime import datetime
-import csv
+import time
+from retry import DEFAULT_POLICY
+from deal_store import DealStore
+from deal_parser import extract_venture_deals
+from sinks import CSVSink
+from money import parse_money
+from instrumentation import instrumented_run, metrics
+
+log = logging.getLogger(__name__)
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
-# Define the pattern at the module level
-investor_pattern = re.compile(r'([^.]+?)\s*led the round and (?:were|was) joined by\s*(.*?)(?:\.|\s*$)', re.IGNORECASE)
-
+# Function to authorise and build the Gmail API client. The Google client libraries
+# are imported here, on first use, as they take longer to load than everything else.
 def get_gmail_service():
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first time.
@@ -35,216 +43,254 @@ def get_gmail_service():
 
     return build('gmail', 'v1', credentials=creds)
 
-def get_recent_emails_from_sender(service, sender_email, max_results=10):
-    results = service.users().messages().list(userId='me', q=f'from:{sender_email}', maxResults=max_results).execute()
-    messages = results.get('messages', [])
-
-    emails = []
-    for message in messages:
-        msg = service.users().messages().get(userId='me', id=message['id'], format='full').execute()
-        
-        # Get email subject and date
-        subject = ''
-        date = ''
-        for header in msg['payload']['headers']:
-            if header['name'] == 'Subject':
-                subject = header['value']
-            elif header['name'] == 'Date':
-                date = header['value']
-            if subject and date:
-                break
+# Newsletter to read deals from
+SENDER_EMAIL = 'fortune@newsletter.fortune.com'
+NUM_EMAILS = 30  # Messages to scan when there is no sync checkpoint yet
 
-        # Get email body
-        body = ''
-        if 'parts' in msg['payload']:
-            for part in msg['payload']['parts']:
-                if part['mimeType'] == 'text/plain':
-                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                    break
-        else:
-            if 'data' in msg['payload']['body']:
-                body = base64.urlsafe_b64decode(msg['payload']['body']['data']).decode('utf-8')
-
-        if not body:
-            print(f"Warning: Could not extract body for email with subject: {subject}")
-        
-        emails.append({
-            'subject': subject,
-            'body': body,
-            'date': date
-        })
-
-    return emails
-
-def extract_venture_deals(email_content, deal_date):
-    venture_deals = []
-    
-    if not email_content:
-        print("Email content is empty.")
-        return venture_deals
-
-    # Split the content by newlines
-    lines = email_content.split('\n')
-    start_index = next((i for i, line in enumerate(lines) if 'VENTURE DEALS' in line), -1)
-    if start_index == -1:
-        print("No 'VENTURE DEALS' section found in the email.")
-        return venture_deals
-
-    print("Found 'VENTURE DEALS' section.")
-    deals_text = lines[start_index+1:]
-
-    # Process each deal
-    current_deal = ""
-    for line in deals_text:
-        line = line.strip()
-        if 'PRIVATE EQUITY' in line:
-            print("Reached 'PRIVATE EQUITY' section. Stopping processing for this email.")
+# Gmail accepts up to 100 calls per batch request; smaller batches avoid per-user rate limits
+BATCH_SIZE = 50
+# Largest page messages.list will return
+LIST_PAGE_SIZE = 500
+# Partial response masks so only the parts of each message we read are transferred
+LIST_FIELDS = 'messages/id,nextPageToken'
+MESSAGE_FIELDS = 'id,historyId,payload(headers,body/data,parts(mimeType,body/data))'
+# messages.get options for a whole message, and for just its sender
+FULL_MESSAGE = {'format': 'full', 'fields': MESSAGE_FIELDS}
+SENDER_ONLY = {'format': 'metadata', 'metadataHeaders': ['From'], 'fields': 'id,payload/headers'}
+# Batch failures worth retrying (rate limits and transient server errors)
+RETRYABLE_BATCH_STATUS = {429, 500, 502, 503, 504}
+# Status of a message deleted since it was listed; it is not retried
+GONE_STATUS = 404
+# sync_state key of the IDs of messages a run could not fetch, retried by the next run
+RETRY_STATE = 'retry_message_ids'
+
+# Function to list message IDs matching a query, following nextPageToken past one page
+def list_message_ids(service, query, max_results):
+    message_ids = []
+    page_token = None
+    while len(message_ids) < max_results:
+        results = service.users().messages().list(
+            userId='me', q=query, maxResults=min(LIST_PAGE_SIZE, max_results - len(message_ids)),
+            pageToken=page_token, fields=LIST_FIELDS).execute()
+        message_ids.extend(message['id'] for message in results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
             break
-        if line.startswith('-'):
-            if current_deal:
-                venture_deals.append(parse_deal(current_deal, deal_date))
-            current_deal = line
-        elif line:
-            current_deal += " " + line
-    
-    # Add the last deal if we haven't reached PRIVATE EQUITY
-    if current_deal and 'PRIVATE EQUITY' not in current_deal:
-        venture_deals.append(parse_deal(current_deal, deal_date))
-
-    return venture_deals
-
-def parse_deal(deal_text, deal_date):
-    # Extract company name and URL
-    company_match = re.search(r'-\s*(.*?)\s*<(https?://[^>]+)>', deal_text)
-    if company_match:
-        company_name = company_match.group(1).strip()
-        company_url = company_match.group(2)
-        company_info = deal_text.split('>')[1].strip()  # Get the text after the URL
-    else:
-        company_name = "No company name found"
-        company_url = "No URL found"
-        company_info = deal_text
-
-    # Extract funding amount
-    funding_match = re.search(r'([$€£¥]?[0-9,.]+\s?(?:million|billion))', company_info)
-    funding_amount = funding_match.group(1) if funding_match else "No funding amount found"
-
-    # Extract investors
-    investor_match = investor_pattern.search(company_info)
-    if investor_match:
-        lead_investors = investor_match.group(1).strip()
-        joined_investors = investor_match.group(2).strip()
-        investors = f"{lead_investors}, {joined_investors}"
+    return message_ids[:max_results]
+
+# Function to fetch messages with batched messages.get calls, returned in message_ids order.
+# Calls that fail with a retryable status are retried in a later batch after a backoff.
+# IDs still not fetched at the end (except deleted messages) are added to `failed`, if
+# given. get_options are the messages.get options (FULL_MESSAGE by default).
+def fetch_messages(service, message_ids, batch_size=BATCH_SIZE, policy=DEFAULT_POLICY, failed=None, **get_options):
+    get_options = get_options or FULL_MESSAGE
+    messages = {}
+    pending = list(message_ids)
+    attempt = 0
+    while pending:
+        retry_ids = []
+
+        def callback(request_id, response, exception):
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            if exception is None:
+                messages[request_id] = response
+            elif status in RETRYABLE_BATCH_STATUS:
+                retry_ids.append(request_id)
+            else:
+                metrics.inc('gmail_failures_total')
+                log.warning("Could not fetch message %s: %s", request_id, exception)
+                if failed is not None and status != GONE_STATUS:
+                    failed.append(request_id)
+
+        for start in range(0, len(pending), batch_size):
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in pending[start:start + batch_size]:
+                batch.add(service.users().messages().get(userId='me', id=message_id, **get_options),
+                          request_id=message_id)
+            with metrics.timer('gmail_batch_seconds'):
+                batch.execute()
+            metrics.inc('gmail_batch_requests_total')
+
+        attempt += 1
+        if retry_ids and attempt > policy.max_retries:
+            metrics.inc('gmail_failures_total', len(retry_ids))
+            log.warning("Giving up on %d message(s) after %d attempts.", len(retry_ids), attempt)
+            if failed is not None:
+                failed.extend(retry_ids)
+            break
+        if retry_ids:
+            wait_time = policy.backoff(attempt)
+            metrics.inc('gmail_retries_total', len(retry_ids))
+            log.warning("Rate limited on %d message(s). Retrying in %.2f seconds...", len(retry_ids), wait_time)
+            time.sleep(wait_time)
+        pending = retry_ids
+
+    return [messages[message_id] for message_id in message_ids if message_id in messages]
+
+# Function to read a message's From header
+def message_sender(msg):
+    for header in msg['payload'].get('headers', []):
+        if header['name'] == 'From':
+            return header['value']
+    return ''
+
+# Function to pull the subject, date and plain-text body out of a message resource
+def parse_message(msg):
+    # Get email subject and date
+    subject = ''
+    date = ''
+    sender = ''
+    for header in msg['payload']['headers']:
+        if header['name'] == 'Subject':
+            subject = header['value']
+        elif header['name'] == 'Date':
+            date = header['value']
+        elif header['name'] == 'From':
+            sender = header['value']
+        if subject and date and sender:
+            break
+
+    # Get email body
+    body = ''
+    if 'parts' in msg['payload']:
+        for part in msg['payload']['parts']:
+            if part['mimeType'] == 'text/plain':
+                body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
+                break
     else:
-        # Try to find investors after "funding from" anywhere in the company_info
-        funding_from_match = re.search(r'funding from\s*(.*?)(?=\.\s*[A-Z]|\s*$)', company_info, re.IGNORECASE | re.DOTALL)
-        if funding_from_match:
-            investors = funding_from_match.group(1).strip()
-        else:
-            investors = "No investors found"
-
-    # Process investors
-    if investors != "No investors found":
-        # Remove "and others" and replace "existing investors" with a comma
-        investors = re.sub(r'\s*,?\s*and\s+others?\s*', '', investors, flags=re.IGNORECASE)
-        investors = re.sub(r'\s*,?\s*existing\s+investors?\s*', ',', investors, flags=re.IGNORECASE)
-        # Remove any trailing comma and whitespace
-        investors = investors.rstrip(',').strip()
-        # Split by comma and 'and', then rejoin with commas
-        investors = [inv.strip() for inv in re.split(r',\s*|\s+and\s+', investors) if inv.strip()]
-        
-        # Remove trailing period from the last investor, if present
-        if investors and investors[-1].endswith('.'):
-            investors[-1] = investors[-1].rstrip('.')
-        
-        investors = ', '.join(investors)
-        
-        # Additional step to remove any remaining 'and' and handle commas
-        def replace_and(match):
-            parts = match.group(0).split('and')
-            if len(parts) == 2:
-                before, after = parts
-                before = before.strip().rstrip(',')
-                after = after.strip().lstrip(',')
-                if before and after:
-                    return f"{before}, {after}"
-                elif before:
-                    return before
-                elif after:
-                    return after
-            return match.group(0)  # If we can't split it, return the original string
-
-        investors = re.sub(r'(^|,\s*)and(\s*,|$)', r'\1\2', investors, flags=re.IGNORECASE)  # Remove 'and' at start or end of list
-        investors = re.sub(r'\w*\s*\band\b\s*\w*', replace_and, investors, flags=re.IGNORECASE)
-        
-        # Remove any duplicate commas and leading/trailing commas
-        investors = re.sub(r',\s*,', ',', investors).strip(',').strip()
-
-        # Final check to remove any remaining 'and's
-        def remove_and(investor):
-            # Remove 'and' when it's preceded by a space and followed by a capital letter
-            return re.sub(r'\s+and(?=[A-Z])', ', ', investor)
-
-        investor_list = re.split(r',\s*', investors)
-        investor_list = [remove_and(inv.strip()) for inv in investor_list]
-        investors = ', '.join(filter(None, investor_list))  # filter(None, ...) removes any empty strings
-    
+        if 'data' in msg['payload']['body']:
+            body = base64.urlsafe_b64decode(msg['payload']['body']['data']).decode('utf-8')
+
+    if not body:
+        log.warning("Could not extract body for email with subject: %s", subject)
+
     return {
-        'company_name': company_name,
-        'url': company_url,
-        'funding': funding_amount,
-        'investors': investors,
-        'deal_date': deal_date
+        'id': msg['id'],
+        'history_id': msg.get('historyId'),
+        'subject': subject,
+        'from': sender,
+        'body': body,
+        'date': date
     }
 
+def get_recent_emails_from_sender(service, sender_email, max_results=10, batch_size=BATCH_SIZE):
+    message_ids = list_message_ids(service, f'from:{sender_email}', max_results)
+    return [parse_message(msg) for msg in fetch_messages(service, message_ids, batch_size)]
+
+# Function to list IDs of messages added since a Gmail historyId, returning
+# (message_ids, latest_history_id), or None if the checkpoint is too old to use
+def list_messages_since(service, start_history_id):
+    from googleapiclient.errors import HttpError  # Already loaded with the service
+
+    message_ids = []
+    page_token = None
+    latest_history_id = start_history_id
+    while True:
+        try:
+            results = service.users().history().list(
+                userId='me', startHistoryId=start_history_id, historyTypes='messageAdded',
+                pageToken=page_token, fields='history/messagesAdded/message/id,historyId,nextPageToken').execute()
+        except HttpError as e:
+            # Gmail answers 404 once a historyId falls outside its retention window
+            if e.resp.status == 404:
+                return None
+            raise
+        for record in results.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message_ids.append(added['message']['id'])
+        latest_history_id = results.get('historyId', latest_history_id)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return list(dict.fromkeys(message_ids)), latest_history_id
+
+# Function to fetch only the sender's messages not yet processed into the store.
+# Uses the stored historyId checkpoint when available, otherwise a full listing of
+# the latest max_results messages; messages an earlier run failed to fetch are tried
+# again. Returns (emails, new_history_id, failed_ids); the caller saves them with
+# save_sync_state once the emails have been processed.
+def sync_new_emails(service, sender_email, store, max_results=10, batch_size=BATCH_SIZE):
+    checkpoint = store.get_state('history_id')
+    retry_ids = json.loads(store.get_state(RETRY_STATE) or '[]')
+    delta = list_messages_since(service, checkpoint) if checkpoint else None
+    if delta is not None:
+        message_ids, history_id = delta
+        log.info("Incremental sync from historyId %s: %d new message(s).", checkpoint, len(message_ids))
+    else:
+        if checkpoint:
+            log.warning("historyId %s has expired. Falling back to a full listing.", checkpoint)
+        # Read the mailbox historyId first so nothing added during the listing is missed next time
+        history_id = service.users().getProfile(userId='me').execute()['historyId']
+        message_ids = list_message_ids(service, f'from:{sender_email}', max_results)
+
+    message_ids = [message_id for message_id in dict.fromkeys(retry_ids + message_ids)
+                   if not store.is_processed(message_id)]
+    failed = []
+    if delta is not None or retry_ids:
+        # History covers the whole mailbox, so only the sender of each message is read
+        # first, and only the newsletter's messages are downloaded in full
+        headers = fetch_messages(service, message_ids, batch_size, failed=failed, **SENDER_ONLY)
+        message_ids = [msg['id'] for msg in headers if sender_email.lower() in message_sender(msg).lower()]
+    emails = [parse_message(msg) for msg in fetch_messages(service, message_ids, batch_size, failed=failed)]
+    if failed:
+        log.warning("%d message(s) could not be fetched; they will be retried next run.", len(failed))
+    return emails, history_id, failed
+
+# Function to save the sync checkpoint once the emails returned by sync_new_emails are stored
+def save_sync_state(store, history_id, failed_ids):
+    store.set_state('history_id', history_id)
+    store.set_state(RETRY_STATE, json.dumps(failed_ids))
+
+# Function to turn an email's Date header into the deal date (YYYY-MM-DD)
+def email_deal_date(email):
+    email_date = datetime.strptime(email['date'], "%a, %d %b %Y %H:%M:%S %z")
+    return email_date.strftime("%Y-%m-%d")
+
+# Function to stream deals to a CSV file, replacing it; deals are written as they are
+# read, so the export never holds the whole store in memory. funding_usd is the
+# funding amount in US dollars, so reports need not re-parse the text.
 def export_to_csv(venture_deals, filename='venture_deals.csv'):
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['company_name', 'company_URL', 'funding', 'investors', 'deal_date']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        writer.writeheader()
-        for deal in venture_deals:
-            # Rename the 'url' key to 'Company URL' for the CSV output
-            deal_copy = deal.copy()
-            deal_copy['company_URL'] = deal_copy.pop('url')
-            writer.writerow(deal_copy)
+    fieldnames = ['company_name', 'company_URL', 'funding', 'investors', 'deal_date', 'funding_usd']
+    sink = CSVSink(filename, fieldnames, append=False)
+    # Deal fields are already in column order, with 'url' written as 'company_URL'
+    for deal in venture_deals:
+        money = parse_money(deal.funding)
+        sink.write((*deal, money.usd if money else ''))
+    sink.close()
+    return sink.written
 
 def main():
     service = get_gmail_service()
-    sender_email = 'fortune@newsletter.fortune.com'
-    num_emails = 30  # Set to 1 for the most recent email
-    emails = get_recent_emails_from_sender(service, sender_email, max_results=num_emails)
+    store = DealStore()
+    emails, history_id, failed_ids = sync_new_emails(service, SENDER_EMAIL, store, max_results=NUM_EMAILS)
 
-    print(f"Fetched {len(emails)} most recent emails from {sender_email}")
-    all_venture_deals = []
+    log.info("Fetched %d new emails from %s", len(emails), SENDER_EMAIL)
+    metrics.inc('gmail_messages_fetched_total', len(emails))
+    new_deals = 0
     for i, email in enumerate(emails, 1):
-        print(f"\nProcessing Email {i}:")
-        print(f"Subject: {email['subject']}")
-        print(f"Date: {email['date']}")
-        
-        # Parse the email date
-        email_date = datetime.strptime(email['date'], "%a, %d %b %Y %H:%M:%S %z")
-        deal_date = email_date.strftime("%Y-%m-%d")
-        
+        log.info("Processing email %d: %s (%s)", i, email['subject'], email['date'])
+
+        deal_date = email_deal_date(email)
+
+        venture_deals = []
         if email['body']:
             venture_deals = extract_venture_deals(email['body'], deal_date)
-            all_venture_deals.extend(venture_deals)
-            print(f"Venture Deals found: {len(venture_deals)}")
+            log.info("Venture deals found: %d", len(venture_deals))
             for deal in venture_deals:
-                print(f"  - Company: {deal['company_name']}")
-                print(f"    URL: {deal['url']}")
-                print(f"    Funding: {deal['funding']}")
-                print(f"    Investors: {deal['investors']}")
-                print(f"    Deal Date: {deal['deal_date']}")
-                print()
+                log.debug("Deal: %s | %s | %s | %s | %s", deal.company_name, deal.url, deal.funding,
+                          deal.investors, deal.deal_date)
         else:
-            print("Email body is empty. Skipping venture deals extraction.")
+            log.warning("Email body is empty. Skipping venture deals extraction.")
+        # Deals are stored with their message so a rerun never parses it again
+        new_deals += store.add_deals(email['id'], venture_deals)
 
-    if all_venture_deals:
-        export_to_csv(all_venture_deals)
-        print(f"\nExported {len(all_venture_deals)} venture deals to CSV.")
-    else:
-        print("\nNo venture deals found to export.")
+    save_sync_state(store, history_id, failed_ids)
+    log.info("Stored %d new venture deals.", new_deals)
+
+    # Export the full deduplicated store rather than just this run's deals
+    exported = export_to_csv(store.iter_deals())
+    log.info("Exported %d venture deals to CSV.", exported)
+    store.close()
 
 if __name__ == '__main__':
-    main()
+    with instrumented_run():
+        main()
@@ -0,0 +1,200 @@
+# Long-running poller watching many funding news feeds at once.
+#
+#   python feed_poller.py                       # poll the default feeds until stopped
+#   python feed_poller.py --feeds feeds.txt     # one feed URL per line
+#   python feed_poller.py --once                # poll the feeds that are due, then exit
+#
+# Due feeds are fetched concurrently by the pooled, per-host rate-limited Fetcher
+# through the local HTTP cache, so an unchanged feed costs a conditional GET answered
+# with 304 and is not parsed at all. Each feed's next poll is scheduled from how often
+# it has published recently, backed off while it stays unchanged, and never made
+# before its Cache-Control/Expires freshness runs out. Entries are classified with the
+# RSS scraper's keyword and company-name logic, and only matched entries not seen
+# before, in any feed, are written out. Schedules persist, so --once suits cron.
+import argparse
+import calendar
+import logging
+import statistics
+import time
+
+import feedparser
+
+import Web_scraping_python as rss
+from dedupe import FingerprintStore, entry_key
+from fetcher import Fetcher, create_session
+from http_cache import HTTPCache, freshness_lifetime
+from instrumentation import instrumented_run, metrics
+from records import ARTICLE_FIELDS
+from sinks import open_sink
+
+log = logging.getLogger(__name__)
+
+# Feeds polled when no --feeds file is given
+DEFAULT_FEEDS = [
+    "https://techcrunch.com/feed/",
+    "https://techcrunch.com/category/venture/feed/",
+    "https://techcrunch.com/category/startups/feed/",
+    "https://techcrunch.com/category/fintech/feed/",
+    "https://news.crunchbase.com/feed/",
+    "https://www.finsmes.com/feed",
+]
+
+# Bounds and starting point (seconds) of each feed's polling interval
+MIN_INTERVAL = 60
+MAX_INTERVAL = 6 * 3600
+DEFAULT_INTERVAL = 15 * 60
+
+# Growth of the interval after a poll that found nothing new (or failed)
+BACKOFF_FACTOR = 1.5
+
+# Fraction of a feed's typical gap between entries to wait between polls
+UPDATE_FRACTION = 0.5
+
+# Most recent entries used to estimate how often a feed publishes
+RECENT_ENTRIES = 10
+
+
+# Polling schedule of one feed: its current interval, when it is next due (Unix time)
+# and the interval suggested by its recent publishing rate, if known
+class FeedState:
+    def __init__(self, url, interval=DEFAULT_INTERVAL, next_poll=0.0, estimate=None):
+        self.url = url
+        self.interval = interval
+        self.next_poll = next_poll
+        self.estimate = estimate
+
+    # Estimate the interval from the gaps between the feed's most recent entries
+    def observe(self, entries):
+        published = sorted(calendar.timegm(entry.published_parsed) for entry in entries
+                           if entry.get('published_parsed'))
+        recent = published[-RECENT_ENTRIES - 1:]
+        gaps = [b - a for a, b in zip(recent, recent[1:]) if b > a]
+        if gaps:
+            self.estimate = statistics.median(gaps) * UPDATE_FRACTION
+
+    # Schedule the next poll after one that found new_entries new entries, no sooner
+    # than the response stays fresh
+    def reschedule(self, now, new_entries, freshness=0.0):
+        if new_entries:
+            interval = self.estimate or self.interval / BACKOFF_FACTOR
+        else:
+            interval = self.interval * BACKOFF_FACTOR
+        self.interval = min(MAX_INTERVAL, max(MIN_INTERVAL, interval, freshness))
+        self.next_poll = now + self.interval
+
+    def to_dict(self):
+        return {'interval': self.interval, 'next_poll': self.next_poll, 'estimate': self.estimate}
+
+
+# Polls a set of feeds on their own schedules, writing new matched entries to a sink.
+# Entries already seen and the feed schedules are kept in the fingerprint store.
+class FeedPoller:
+    def __init__(self, urls, fetcher, fingerprints, sink):
+        self.fetcher = fetcher
+        self.fingerprints = fingerprints
+        self.sink = sink
+        self.feeds = {url: self.load_state(url) for url in urls}
+
+    def load_state(self, url):
+        seen, state = self.fingerprints.lookup('feed-schedule', url, '')
+        return FeedState(url, **state) if seen and state else FeedState(url)
+
+    def due(self, now):
+        return [url for url, state in self.feeds.items() if state.next_poll <= now]
+
+    def next_due(self):
+        return min(state.next_poll for state in self.feeds.values())
+
+    # Fetch the given feeds concurrently and process each as it arrives, returning the
+    # number of new matched articles written
+    def poll(self, urls):
+        written = self.sink.written
+        new_total = 0
+        for url, response in self.fetcher.fetch_all(urls):
+            state = self.feeds[url]
+            if response is None:
+                metrics.inc('feed_polls_total', result='failed')
+                state.reschedule(time.time(), 0)
+            elif getattr(response, 'from_cache', False):
+                metrics.inc('feed_polls_total', result='not_modified')
+                state.reschedule(time.time(), 0, freshness_lifetime(response.headers))
+            else:
+                metrics.inc('feed_polls_total', result='updated')
+                with metrics.timer('parse_seconds', func='feedparser'):
+                    entries = feedparser.parse(response.content).entries
+                new_entries = self.process_entries(entries)
+                new_total += new_entries
+                state.observe(entries)
+                state.reschedule(time.time(), new_entries, freshness_lifetime(response.headers))
+            log.debug("Next poll of %s in %.0f seconds", url, state.interval)
+            self.fingerprints.record('feed-schedule', url, '', state.to_dict())
+
+        # Entries are only remembered once the articles found among them are on disk
+        self.sink.flush()
+        self.fingerprints.commit()
+        matched = self.sink.written - written
+        log.info("Polled %d feed(s): %d new entries, %d funding articles", len(urls), new_total, matched)
+        return matched
+
+    # Classify the entries not seen before, writing the matches; returns how many were new
+    def process_entries(self, entries):
+        new_entries = 0
+        for entry in entries:
+            key = entry_key(entry)
+            if not key or self.fingerprints.seen('feed-entry', key):
+                continue  # Already seen here or in another feed carrying the same story
+            new_entries += 1
+            article = rss.classify_entry(entry)
+            self.fingerprints.record('feed-entry', key)
+            if article:
+                self.sink.write(article)
+        metrics.inc('feed_entries_new_total', new_entries)
+        return new_entries
+
+    # Poll feeds as they fall due until interrupted, or just once
+    def run(self, once=False):
+        while True:
+            due = self.due(time.time())
+            if due:
+                self.poll(due)
+            if once:
+                return
+            time.sleep(max(0.0, self.next_due() - time.time()))
+
+
+# Function to read feed URLs from a file, one per line, ignoring blanks and # comments
+def read_feeds(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll many funding news feeds on adaptive schedules.")
+    parser.add_argument('--feeds', help="file listing the feed URLs, one per line (default: built-in list)")
+    parser.add_argument('--output', default='feed_articles.csv', help="CSV (or .parquet) file of new funding articles")
+    parser.add_argument('--rotate-daily', action='store_true', help="write one output file per day")
+    parser.add_argument('--once', action='store_true', help="poll the feeds that are due, then exit")
+    parser.add_argument('--concurrency', type=int, default=8, help="feeds fetched at once")
+    parser.add_argument('--rate', type=float, default=1.0, help="requests per second allowed against one host")
+    args = parser.parse_args(argv)
+
+    urls = read_feeds(args.feeds) if args.feeds else DEFAULT_FEEDS
+    with instrumented_run():
+        rss.company_extractor.use_known_companies()
+        session = create_session(args.concurrency, cache=HTTPCache())
+        fetcher = Fetcher(session, args.concurrency, args.rate)
+        fingerprints = FingerprintStore()
+        sink = open_sink(args.output, ARTICLE_FIELDS, rotate_daily=args.rotate_daily)
+        poller = FeedPoller(urls, fetcher, fingerprints, sink)
+        log.info("Polling %d feed(s)", len(urls))
+        try:
+            poller.run(args.once)
+        except KeyboardInterrupt:
+            log.info("Stopped.")
+        finally:
+            sink.close()
+            fingerprints.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import CachingAdapter
+from instrumentation import metrics
+from retry import (DEFAULT_POLICY, DEFAULT_TIMEOUT, OK, RETRYABLE_ERRORS, attempt_request, classify,
+                   describe_failure)
+
+log = logging.getLogger(__name__)
+
+# Default politeness budget: requests per second allowed against a single host
+DEFAULT_RATE = 1.0
+# Default number of requests allowed in flight at once
+DEFAULT_CONCURRENCY = 8
+
+
+# Token bucket refilled at `rate` tokens per second, holding at most `burst` tokens
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Block until a token is available and take it
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# One token bucket per host, so each site gets its own rate budget
+class HostRateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url):
+        self.bucket_for(url).acquire()
+
+
+# Function to create a session whose connection pool can serve every worker,
+# optionally answering repeat requests from an HTTPCache via conditional GETs
+def create_session(concurrency=DEFAULT_CONCURRENCY, cache=None, immutable_urls=None):
+    session = requests.Session()
+    if cache is not None:
+        adapter = CachingAdapter(cache, immutable_urls, pool_connections=concurrency, pool_maxsize=concurrency)
+    else:
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Fetches many URLs concurrently over one pooled session, within per-host rate budgets.
+# Failed requests are rescheduled rather than retried in place, so a URL that is
+# backing off never holds a worker while other requests are waiting.
+class Fetcher:
+    def __init__(self, session=None, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 policy=DEFAULT_POLICY, timeout=DEFAULT_TIMEOUT):
+        self.concurrency = concurrency
+        self.session = session if session is not None else create_session(concurrency)
+        self.limiter = HostRateLimiter(rate)
+        self.policy = policy
+        self.timeout = timeout
+
+    # Make a single rate-limited attempt, returning (response, error). With consume, the
+    # body is streamed and a successful response is handed to consume in this worker
+    # thread; its result is kept as response.consumed and the connection released.
+    # Connection errors while consuming are retried; any other error raised by consume
+    # fails this URL permanently instead of aborting the whole fetch_all.
+    def attempt(self, url, consume=None):
+        with metrics.timer('rate_limit_wait_seconds'):
+            self.limiter.acquire(url)
+        if consume is None:
+            return attempt_request(url, self.session, self.timeout)
+        response, error = attempt_request(url, self.session, self.timeout, stream=True)
+        if classify(response, error) != OK:
+            if response is not None:
+                response.close()
+            return response, error
+        try:
+            response.consumed = consume(response)
+        except RETRYABLE_ERRORS as e:  # The connection failed while the body was read
+            return None, e
+        except Exception as e:
+            log.debug("Could not process the body of %s", url, exc_info=True)
+            return None, e
+        finally:
+            response.close()
+        return response, None
+
+    # Yield (url, response) pairs as soon as each request completes; the response
+    # is None for URLs that failed permanently or ran out of retries. Given a consume
+    # function (see attempt), (url, result of consume) pairs are yielded instead.
+    def fetch_all(self, urls, consume=None):
+        ready = deque((url, 0) for url in urls)
+        if not ready:
+            return
+        delayed = []  # Heap of (ready_at, sequence, url, attempts) for URLs backing off
+        sequence = itertools.count()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(ready))) as executor:
+            while ready or delayed or in_flight:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    _, _, url, attempts = heapq.heappop(delayed)
+                    ready.append((url, attempts))
+                while ready and len(in_flight) < self.concurrency:
+                    url, attempts = ready.popleft()
+                    in_flight[executor.submit(self.attempt, url, consume)] = (url, attempts)
+
+                wait_time = max(0.0, delayed[0][0] - now) if delayed else None
+                if not in_flight:
+                    time.sleep(wait_time)
+                    continue
+                done, _ = wait(in_flight, timeout=wait_time, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    url, attempts = in_flight.pop(future)
+                    response, error = future.result()
+                    attempts += 1
+                    if classify(response, error) == OK:
+                        yield url, response if consume is None else response.consumed
+                        continue
+                    retry_in = self.policy.next_delay(attempts, response, error)
+                    if retry_in is None:
+                        metrics.inc('http_failures_total')
+                        log.error("Failed to retrieve %s after %d attempt(s): %s",
+                                  url, attempts, describe_failure(response, error))
+                        yield url, None
+                        continue
+                    metrics.inc('http_retries_total')
+                    log.warning("Error occurred for %s: %s. Retrying in %.2f seconds...",
+                                url, describe_failure(response, error), retry_in)
+                    heapq.heappush(delayed, (time.monotonic() + retry_in, next(sequence), url, attempts))
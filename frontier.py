@@ -0,0 +1,79 @@
+import json
+import os
+
+from dates import parse_day
+
+DEFAULT_FRONTIER_FILE = "crawl_frontier.json"
+
+
+# Crawl frontier of a paginated listing (newest articles first), persisted as JSON.
+# It remembers the newest article seen by the last completed crawl, so the next crawl
+# can stop paging once it reaches it, and, while a crawl is running, the next listing
+# page to read and the date of the oldest article already handled, so an interrupted
+# crawl resumes at the right page instead of being cut short by the pages it finished.
+# Articles whose download failed are kept too, so a later crawl fetches them again even
+# though its listing walk stops above them, and so is whether a listing page failed
+# since the last clean crawl, in which case pages of known articles prove nothing.
+class CrawlFrontier:
+    def __init__(self, listing_url, path=DEFAULT_FRONTIER_FILE):
+        self.listing_url = listing_url
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+        entry = self.state.get(listing_url, {})
+        self.newest_link = entry.get('newest_link')
+        self.newest_date = entry.get('newest_date')
+        self.resume_page = entry.get('resume_page')
+        self.resume_date = parse_day(entry['resume_date']) if entry.get('resume_date') else None
+        self.failed = entry.get('failed', {})  # link -> [title, published date, summary]
+        self.listing_incomplete = entry.get('listing_incomplete', False)
+
+    # Record that every article on `page` up to `oldest` (a datetime) has been handled
+    def page_done(self, page, oldest):
+        self.resume_page = page + 1
+        self.resume_date = oldest
+        self.save()
+
+    # Record an article whose download failed (saved with the next checkpoint)
+    def fetch_failed(self, title, link, published_date, summary):
+        self.failed[link] = [title, published_date.strftime("%Y-%m-%d"), summary]
+
+    def fetched(self, link):
+        self.failed.pop(link, None)
+
+    # (title, link, published_date, summary) of the failed articles published since
+    # `since`; older ones are forgotten
+    def retries(self, since):
+        for link, (title, published_date, summary) in list(self.failed.items()):
+            published_date = parse_day(published_date)
+            if published_date < since:
+                del self.failed[link]
+            else:
+                yield title, link, published_date, summary
+
+    # Record a finished crawl whose newest article was (link, published datetime). After
+    # a crawl that missed a listing page (clean=False) the previous newest article stays
+    # the stopping point and the listing is marked incomplete until a clean crawl.
+    def complete(self, newest_link, newest_date, clean=True):
+        if newest_link and clean:
+            self.newest_link = newest_link
+            self.newest_date = newest_date.strftime("%Y-%m-%d")
+        self.listing_incomplete = not clean
+        self.resume_page = self.resume_date = None
+        self.save()
+
+    def save(self):
+        self.state[self.listing_url] = {
+            'newest_link': self.newest_link,
+            'newest_date': self.newest_date,
+            'resume_page': self.resume_page,
+            'resume_date': self.resume_date.strftime("%Y-%m-%d") if self.resume_date else None,
+            'failed': self.failed,
+            'listing_incomplete': self.listing_incomplete,
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.path)
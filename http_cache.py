@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from instrumentation import metrics
+
+# Default location and size budget of the on-disk cache
+DEFAULT_CACHE_PATH = "http_cache.db"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Cache hits refresh an entry's last access at most this often (seconds), and the
+# refreshed times are written in batches of ACCESS_BATCH
+ACCESS_RESOLUTION = 60
+ACCESS_BATCH = 100
+
+# Headers that describe the encoded transfer rather than the stored (decoded) body
+TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+# Function to read how many seconds a response stays fresh from its Cache-Control
+# (s-maxage or max-age, less its Age) or Expires headers; 0 when it must be revalidated
+def freshness_lifetime(headers):
+    directives = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        directives[name.lower()] = value.strip('"')
+    if 'no-cache' in directives or 'no-store' in directives:
+        return 0.0
+    age = headers.get('Age', '')
+    age = float(age) if age.isdigit() else 0.0
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name, '').isdigit():
+            return max(0.0, float(directives[name]) - age)
+    try:
+        lifetime = parsedate_to_datetime(headers['Expires']) - parsedate_to_datetime(headers['Date'])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    return max(0.0, lifetime.total_seconds())
+
+
+# On-disk HTTP cache keyed by URL, holding validators and zlib-compressed bodies,
+# evicting least recently used entries once the stored bodies exceed max_bytes. The
+# size is summed from the table when storing, so several caches (processes) sharing
+# one file keep it within budget together. Cache hits do not write: their access
+# times are kept in memory, at most one per URL every ACCESS_RESOLUTION seconds, and
+# written with the next store, every ACCESS_BATCH hits, or on close.
+class HTTPCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pending_access = {}  # url -> access time not yet written
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS responses
+                             (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,
+                              headers TEXT, body BLOB, size INTEGER, accessed REAL)''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.conn.commit()
+
+    # Return (etag, last_modified, headers, body) for a URL, or None if not cached
+    def lookup(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified, headers, body, accessed FROM responses WHERE url=?",
+                                    (url,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[4] >= ACCESS_RESOLUTION:
+                self.pending_access[url] = now
+                if len(self.pending_access) >= ACCESS_BATCH:
+                    self.flush_access()
+                    self.conn.commit()
+        etag, last_modified, headers, body, _ = row
+        return etag, last_modified, json.loads(headers), zlib.decompress(body)
+
+    def store(self, url, etag, last_modified, headers, content):
+        body = zlib.compress(content)
+        with self.lock:
+            self.pending_access.pop(url, None)
+            self.flush_access()
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (url, etag, last_modified, json.dumps(headers), body, len(body), time.time()))
+            self.evict()
+            self.conn.commit()
+
+    # Write the access times of recent cache hits (the caller commits)
+    def flush_access(self):
+        if self.pending_access:
+            self.conn.executemany("UPDATE responses SET accessed=? WHERE url=?",
+                                  [(accessed, url) for url, accessed in self.pending_access.items()])
+            self.pending_access.clear()
+
+    # Drop least recently used entries until the cache fits its size budget
+    def evict(self):
+        total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        # Keep the most recently used entries whose running total fits the budget
+        self.conn.execute('''DELETE FROM responses WHERE url IN
+                               (SELECT url FROM (SELECT url, SUM(size) OVER (ORDER BY accessed DESC, url)
+                                                 AS kept FROM responses)
+                                WHERE kept > ?)''', (self.max_bytes,))
+
+    def close(self):
+        with self.lock:
+            self.flush_access()
+            self.conn.commit()
+            self.conn.close()
+
+
+# Transport adapter that revalidates cached GETs with If-None-Match/If-Modified-Since
+# and turns 304 Not Modified replies back into full responses served from disk.
+# URLs matching `immutable_urls` (a compiled regex) are served from cache without
+# revalidation, e.g. Wayback snapshots whose content never changes.
+class CachingAdapter(HTTPAdapter):
+    def __init__(self, cache, immutable_urls=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.immutable_urls = immutable_urls
+
+    def is_immutable(self, url):
+        return self.immutable_urls is not None and self.immutable_urls.search(url) is not None
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method != 'GET':
+            return super().send(request, stream=stream, **kwargs)
+
+        entry = self.cache.lookup(request.url)
+        if entry is not None and self.is_immutable(request.url):
+            metrics.inc('http_cache_total', result='immutable_hit')
+            return self.cached_response(request, entry)
+        if entry is not None:
+            etag, last_modified, _, _ = entry
+            if etag:
+                request.headers['If-None-Match'] = etag
+            if last_modified:
+                request.headers['If-Modified-Since'] = last_modified
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            metrics.inc('http_cache_total', result='revalidated_hit')
+            response.close()
+            return self.cached_response(request, entry)
+        metrics.inc('http_cache_total', result='miss')
+        # Streamed bodies are left to the caller rather than read here
+        if response.status_code == 200 and not stream:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified or self.is_immutable(request.url):
+                headers = {k: v for k, v in response.headers.items() if k.lower() not in TRANSFER_HEADERS}
+                self.cache.store(request.url, etag, last_modified, headers, response.content)
+        return response
+
+    # Build a 200 response from a cache entry
+    def cached_response(self, request, entry):
+        _, _, headers, body = entry
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = body
+        response._content_consumed = True  # Lets iter_content() stream the cached body
+        response.from_cache = True
+        return response
@@ -0,0 +1,207 @@
+# Lightweight run instrumentation: counters and timing histograms recorded by the
+# fetch, parse, classify and storage code, plus the logging setup shared by the scripts.
+#
+# Metrics are written at the end of a run (and every SCRAPER_METRICS_INTERVAL seconds
+# while it runs) to SCRAPER_METRICS_FILE: JSON, or Prometheus text format when the file
+# name ends in .prom. Logging is configured from SCRAPER_LOG_LEVEL (default INFO) and
+# SCRAPER_LOG_JSON=1 for one JSON object per line.
+import bisect
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the timing histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "scraper_"
+
+
+# Distribution of observed values over fixed buckets, with their count and sum
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'max': self.max,
+                'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.cumulative()))}
+
+    def cumulative(self):
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+# Registry of named counters and histograms, each optionally split by labels, e.g.
+# metrics.inc('http_requests_total', status=200). Safe to use from several threads.
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Time the enclosed block into the histogram `name`
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # Decorator timing every call of a function into the histogram `name`
+    def timed(self, name, **labels):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def counter_value(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'counters': {series_name(name, labels): value for (name, labels), value in sorted(self.counters.items())},
+                'histograms': {series_name(name, labels): histogram.to_dict()
+                               for (name, labels), histogram in sorted(self.histograms.items())},
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{METRIC_PREFIX}{series_name(name, labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                    typed.add(name)
+                bounds = [str(bound) for bound in histogram.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    lines.append(f"{METRIC_PREFIX}{series_name(name + '_bucket', labels + (('le', bound),))} {count}")
+                lines.append(f"{METRIC_PREFIX}{series_name(name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{METRIC_PREFIX}{series_name(name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # Write the metrics to path, atomically, as Prometheus text (.prom) or JSON
+    def write(self, path):
+        text = self.to_prometheus() if path.endswith('.prom') else json.dumps(self.to_dict(), indent=2)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+
+# Function to format a metric name with its labels, Prometheus style: name{a="1",b="2"}
+def series_name(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+# The registry shared by every module in a run
+metrics = Metrics()
+
+
+# Background thread rewriting the metrics file every `interval` seconds, so a long run
+# can be watched (or scraped by a Prometheus textfile collector) while it works
+class MetricsReporter:
+    def __init__(self, path, interval, registry=metrics):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.registry.write(self.path)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+# Log formatter writing one JSON object per record
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'level': record.levelname, 'logger': record.name,
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+# Function to configure the root logger for a script run
+def configure_logging(level=None, json_format=None):
+    level = level or os.environ.get('SCRAPER_LOG_LEVEL', 'INFO')
+    if json_format is None:
+        json_format = os.environ.get('SCRAPER_LOG_JSON', '') not in ('', '0')
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter() if json_format else
+                         logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.basicConfig(level=level.upper(), handlers=[handler], force=True)
+
+
+# Context manager wrapping a script's main(): sets up logging, reports metrics on an
+# interval if asked to, and writes the final metrics when the run ends (even on error)
+@contextmanager
+def instrumented_run(metrics_file=None, interval=None, log_level=None, json_logs=None):
+    configure_logging(log_level, json_logs)
+    metrics_file = metrics_file or os.environ.get('SCRAPER_METRICS_FILE')
+    interval = interval or float(os.environ.get('SCRAPER_METRICS_INTERVAL', 0) or 0)
+    reporter = MetricsReporter(metrics_file, interval).start() if metrics_file and interval else None
+    try:
+        yield metrics
+    finally:
+        if reporter:
+            reporter.stop()
+        if metrics_file:
+            metrics.write(metrics_file)
+            logging.getLogger(__name__).info("Metrics written to %s", metrics_file)
@@ -0,0 +1,145 @@
+# Parses funding amounts such as "$12.5 million", "€600M" or "£3bn" into numbers and
+# normalises them to US dollars.
+#
+#   python money.py venture_deals.csv --column funding
+#
+# adds a funding_usd column to a CSV export (in place unless --output is given).
+import argparse
+import csv
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+from instrumentation import instrumented_run
+
+log = logging.getLogger(__name__)
+
+# Currency of each symbol; amounts written without one ("12.5 million") are dollars,
+# as the newsletter deal parser reads them
+CURRENCY_CODES = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY'}
+DEFAULT_SYMBOL = '$'
+
+# Approximate US dollars per unit of each currency; pass rates= to use current ones
+USD_RATES = {'USD': 1.0, 'EUR': 1.08, 'GBP': 1.27, 'JPY': 0.0067}
+
+UNIT_SIZES = {'thousand': 1e3, 'k': 1e3, 'million': 1e6, 'mn': 1e6, 'm': 1e6,
+              'billion': 1e9, 'bn': 1e9, 'b': 1e9}
+
+# Symbol, number and optional unit, or a number standing alone with a unit word (so
+# years and round numbers are not read as amounts); written without inline flags so
+# pandas can use it too
+MONEY_PATTERN = (r'(?:(?P<symbol>[$€£¥])\s?'
+                 r'|(?<![\w.,])(?=\d[\d,]*(?:\.\d+)?\s?(?:thousand|million|billion|mn|bn)\b))'
+                 r'(?P<number>\d[\d,]*(?:\.\d+)?)'
+                 r'(?:\s?(?P<unit>thousand|million|billion|mn|bn|[kmb])\b)?')
+money_pattern = re.compile(MONEY_PATTERN, re.IGNORECASE)
+
+
+# A parsed amount: the text it was read from, its value in its own currency, the
+# currency code and the value in US dollars (None when there is no rate for it)
+class Money(NamedTuple):
+    text: str
+    amount: float
+    currency: str
+    usd: float
+
+
+# Function to read the first amount in text as (matched text, amount, currency code).
+# Funding strings repeat a lot ("$10 million"), so results are memoised.
+@lru_cache(maxsize=4096)
+def match_amount(text):
+    match = money_pattern.search(text)
+    if not match:
+        return None
+    amount = float(match.group('number').replace(',', ''))
+    unit = match.group('unit')
+    if unit:
+        amount *= UNIT_SIZES[unit.lower()]
+    return match.group(), amount, CURRENCY_CODES[match.group('symbol') or DEFAULT_SYMBOL]
+
+
+# Function to parse the first amount in text into a Money, or None if there is none
+def parse_money(text, rates=None):
+    matched = match_amount(text or '')
+    if matched is None:
+        return None
+    text, amount, currency = matched
+    rate = (rates or USD_RATES).get(currency)
+    return Money(text, amount, currency, amount * rate if rate is not None else None)
+
+
+# Function to find every amount in text
+def find_money(text, rates=None):
+    for match in money_pattern.finditer(text or ''):
+        yield parse_money(match.group(), rates)
+
+
+# Function to normalise a whole column of funding strings to US dollars at once.
+# A pandas Series is converted with vectorised string and arithmetic operations and
+# returned as a float Series; a NumPy array gives a float array; any other iterable
+# gives a list. Missing or unparseable amounts become NaN (None in a list).
+def to_usd(values, rates=None):
+    rates = rates or USD_RATES
+    module = type(values).__module__
+    if module.startswith('pandas'):
+        parts = values.astype('string').str.extract(money_pattern)
+        numbers = parts['number'].str.replace(',', '', regex=False).astype('float64')
+        sizes = parts['unit'].str.lower().map(UNIT_SIZES).astype('float64').fillna(1.0)
+        usd_rates = parts['symbol'].fillna(DEFAULT_SYMBOL).map(CURRENCY_CODES).map(rates).astype('float64')
+        return numbers * sizes * usd_rates
+    usd = []
+    for value in values:
+        money = parse_money(value, rates) if isinstance(value, str) else None
+        usd.append(money.usd if money else None)
+    if module.startswith('numpy'):
+        import numpy
+        return numpy.array([float('nan') if value is None else value for value in usd], dtype='float64')
+    return usd
+
+
+# Function to add a <column>_usd column to a CSV file, using pandas when installed and
+# streaming the rows through the csv module otherwise
+def add_usd_column(path, column, output=None, rates=None):
+    output = output or path
+    try:
+        import pandas
+    except ImportError:
+        pandas = None
+    if pandas is not None:
+        frame = pandas.read_csv(path, dtype=str, keep_default_na=False)
+        frame[f"{column}_usd"] = to_usd(frame[column], rates)
+        frame.to_csv(output, index=False)
+        return len(frame)
+
+    temp_path = output + ".tmp"
+    rows = 0
+    with open(path, newline='', encoding='utf-8') as source, \
+            open(temp_path, 'w', newline='', encoding='utf-8') as target:
+        reader = csv.DictReader(source)
+        writer = csv.DictWriter(target, reader.fieldnames + [f"{column}_usd"])
+        writer.writeheader()
+        for row in reader:
+            money = parse_money(row[column], rates)
+            row[f"{column}_usd"] = money.usd if money and money.usd is not None else ''
+            writer.writerow(row)
+            rows += 1
+    os.replace(temp_path, output)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add a US-dollar column to a CSV of funding amounts.")
+    parser.add_argument('path', help="CSV file to read")
+    parser.add_argument('--column', default='funding', help="column holding the funding amounts")
+    parser.add_argument('--output', help="file to write (defaults to replacing the input)")
+    args = parser.parse_args(argv)
+
+    with instrumented_run():
+        rows = add_usd_column(args.path, args.column, args.output)
+        log.info("Added %s_usd to %d rows of %s", args.column, rows, args.output or args.path)
+
+
+if __name__ == '__main__':
+    main()
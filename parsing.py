@@ -0,0 +1,178 @@
+import codecs
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from instrumentation import metrics
+
+# lxml parses several times faster than the pure-Python parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Only the article body containers are built into a tree; the rest of the page is skipped
+ARTICLE_CLASSES = ['article-content', 'article-container']
+article_strainer = SoupStrainer('div', class_=ARTICLE_CLASSES)
+
+# Most bytes of an article page read when streaming, and the size of each read
+MAX_ARTICLE_BYTES = 512 * 1024
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+# Function to extract the body text of a TechCrunch article from raw HTML bytes
+def extract_article_text(content):
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=article_strainer)
+    for class_name in ARTICLE_CLASSES:
+        content_element = soup.find('div', class_=class_name)
+        if content_element:
+            return content_element.text
+    return ""
+
+
+# Incremental parser collecting the text of the first article body container. No tree
+# is built: text before the container is ignored, and `finished` is set once the
+# container closes, so the caller can stop feeding the rest of the page.
+class ArticleTextParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0  # Open divs inside the container (0 = not in it yet)
+        self.skipping = 0  # Open script/style elements inside the container
+        self.parts = []
+        self.finished = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.finished:
+            return
+        if tag == 'div':
+            if self.depth:
+                self.depth += 1
+            elif set((dict(attrs).get('class') or '').split()) & set(ARTICLE_CLASSES):
+                self.depth = 1
+        elif self.depth and tag in ('script', 'style'):
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if not self.depth or self.finished:
+            return
+        if tag == 'div':
+            self.depth -= 1
+            self.finished = not self.depth
+        elif tag in ('script', 'style') and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if self.depth and not self.skipping and not self.finished:
+            self.parts.append(data)
+
+    def text(self):
+        return ''.join(self.parts)
+
+
+# Function to extract the body text of an article from a streamed response without
+# downloading the whole page. The HTML is parsed as it arrives and reading stops at the
+# end of the article container, as soon as decided(text so far) is true, or after
+# max_bytes, whichever comes first; the rest of the page is never read.
+def stream_article_text(response, decided=None, max_bytes=MAX_ARTICLE_BYTES):
+    parser = ArticleTextParser()
+    # requests assumes ISO-8859-1 for HTML without a declared charset; the pages are UTF-8
+    declared = 'charset=' in response.headers.get('Content-Type', '').lower()
+    try:
+        decoder = codecs.getincrementaldecoder(response.encoding if declared else 'utf-8')(errors='replace')
+    except LookupError:  # A charset Python does not know
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    read = 0
+    reason = 'eof'
+    with metrics.timer('parse_seconds', func='stream_article_text'):
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            read += len(chunk)
+            seen = len(parser.parts)
+            parser.feed(decoder.decode(chunk))
+            if parser.finished:
+                reason = 'container_end'
+                break
+            if decided is not None and len(parser.parts) > seen and decided(parser.text()):
+                reason = 'decided'
+                break
+            if read >= max_bytes:
+                reason = 'byte_cap'
+                break
+        response.close()
+    metrics.inc('article_stream_total', reason=reason)
+    if not getattr(response, 'from_cache', False):
+        metrics.inc('http_bytes_total', read, host=urlsplit(response.url).hostname or '')
+    return parser.text()
+
+
+# Function to strip HTML tags from a feed entry summary
+def html_to_text(html):
+    return BeautifulSoup(html, HTML_PARSER).get_text()
+
+
+# Function run in a pool worker: call func and return its result with the seconds it
+# took, so parse time can be recorded in the parent (worker metrics would be lost)
+def timed_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+# Process pool for CPU-bound HTML parsing, so parsing scales across cores and overlaps
+# with network I/O on the main thread. Functions and arguments must be picklable,
+# which is why the parse functions above take and return plain bytes/strings.
+# workers=0 parses inline in the calling process.
+class ParsePool:
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+
+    def submit(self, func, *args):
+        future = Future()
+        if self.executor is not None:
+            self.executor.submit(timed_call, func, *args).add_done_callback(
+                partial(self.resolve, future, func.__name__))
+            return future
+        try:
+            with metrics.timer('parse_seconds', func=func.__name__):
+                future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    # Hand a worker's result to the caller's future, recording how long it took
+    @staticmethod
+    def resolve(future, name, worker_future):
+        try:
+            result, seconds = worker_future.result()
+        except Exception as e:
+            future.set_exception(e)
+            return
+        metrics.observe('parse_seconds', seconds, func=name)
+        future.set_result(result)
+
+    # Apply func to every item, preserving order; chunksize batches small items per task
+    def map(self, func, items, chunksize=16):
+        if self.executor is None:
+            return [self.submit(func, item).result() for item in items]
+        results = []
+        for result, seconds in self.executor.map(partial(timed_call, func), items, chunksize=chunksize):
+            metrics.observe('parse_seconds', seconds, func=func.__name__)
+            results.append(result)
+        return results
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
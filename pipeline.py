@@ -0,0 +1,320 @@
+# Unified pipeline runner.
+#
+# Each source plugin yields records from a generator; the records stream through the
+# source's classify/extract stages into its sinks one at a time, so memory stays
+# bounded however much a source produces. Sources run concurrently, one thread each.
+#
+#   python pipeline.py all
+#   python pipeline.py rss techcrunch --output-dir out/
+#   python pipeline.py wayback --start 2024-09-01 --end 2024-09-30
+#   python pipeline.py all --format parquet --rotate-mb 64 --rotate-daily
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from functools import partial
+
+from article_store import DEFAULT_ARTICLES_DB, ArticleStore
+from company_names import CompanyNameExtractor, load_known_companies
+from dates import day_argument
+from instrumentation import instrumented_run, metrics
+from records import ARTICLE_FIELDS, Article, intern_text
+from sinks import open_sink
+
+log = logging.getLogger(__name__)
+
+# Marker a source yields into its stream. Stages pass it through untouched; once the
+# runner has flushed every sink with the records before it, on_commit is called, so
+# a source can checkpoint its progress only after its output is durable.
+class Barrier:
+    def __init__(self, on_commit):
+        self.on_commit = on_commit
+
+
+# Stage: take (Article, text) pairs and keep the articles whose text matches the
+# classifier, recording the keywords found; the text is dropped. require_all needs
+# both keywords and a currency symbol.
+def classify(records, classifier, require_all=False):
+    for record in records:
+        if isinstance(record, Barrier):
+            yield record
+            continue
+        article, text = record
+        found_keywords, found_currency = classifier.classify(text)
+        matched = (found_keywords and found_currency) if require_all else (found_keywords or found_currency)
+        if matched:
+            article.found_keywords = intern_text(", ".join(found_keywords))
+            yield article
+
+
+# Stage: fill in the company name from each record's title
+def extract_companies(records, extractor):
+    for record in records:
+        if not isinstance(record, Barrier):
+            record.company_name = intern_text(extractor.extract(record.title))
+        yield record
+
+
+# Function to build a company-name extractor resolving names against known companies
+def company_extractor(funding_verbs):
+    return CompanyNameExtractor(funding_verbs, known=load_known_companies())
+
+
+# Sink inserting article records into an ArticleStore, batch_size records per transaction
+class ArticleStoreSink:
+    def __init__(self, path, batch_size=1):
+        self.store = ArticleStore(path)
+        self.batch_size = batch_size
+        self.pending = []
+
+    def write(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.store.add_many(self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.store.close()
+
+
+# Base class for source plugins. Dependencies are imported inside the methods, so a
+# run only loads what its sources need, and sinks are created in the thread that
+# runs the source (SQLite connections must stay on their own thread).
+class Source:
+    name = None
+
+    # Options for the record file sinks: format ('csv' or 'parquet') plus
+    # the append / rotate_bytes / rotate_daily options of sinks.RotatingFileSink
+    def __init__(self, file_format='csv', **sink_options):
+        self.file_format = file_format
+        self.sink_options = sink_options
+
+    # Generator of records (and Barriers): Articles or Deals, or (Article, text to
+    # classify) pairs for a source whose stages classify them
+    def records(self):
+        raise NotImplementedError
+
+    # Generator transforms applied to the record stream, in order
+    def stages(self):
+        return []
+
+    def record_sink(self, output_dir, fieldnames):
+        path = os.path.join(output_dir, f"{self.name}_records.{self.file_format}")
+        return open_sink(path, fieldnames, **self.sink_options)
+
+    def sinks(self, output_dir):
+        return [self.record_sink(output_dir, ARTICLE_FIELDS)]
+
+
+# TechCrunch RSS feed (Web_scraping_python.py): entries the RSS scraper has not seen
+# before, classified and named by it (summaries need keywords and a currency)
+class RSSFeedSource(Source):
+    name = 'rss'
+
+    def __init__(self, url=None, **options):
+        super().__init__(**options)
+        self.url = url
+
+    def records(self):
+        import Web_scraping_python as rss
+        from dedupe import FingerprintStore
+
+        rss.company_extractor.use_known_companies()
+        fingerprints = FingerprintStore()
+        yield from rss.classify_entries(rss.fetch_feed(self.url or rss.rss_url).entries, fingerprints, new_only=True)
+        yield Barrier(fingerprints.close)
+
+
+# TechCrunch startup category pages (techcrunch_scrape.py), classified on the full article
+class TechCrunchCategorySource(Source):
+    name = 'techcrunch'
+
+    def records(self):
+        import techcrunch_scrape as tc
+        from fetcher import Fetcher, create_session
+        from http_cache import HTTPCache
+        from parsing import ParsePool
+
+        store = ArticleStore()
+        store.migrate_json()
+        one_month_ago = datetime.now() - timedelta(days=30)
+        fetcher = Fetcher(create_session(tc.CONCURRENCY, cache=HTTPCache()),
+                          concurrency=tc.CONCURRENCY, rate=tc.REQUESTS_PER_SECOND)
+        with ParsePool(0 if tc.STREAM_ARTICLES else tc.PARSE_WORKERS) as pool:
+            for title, link, published_date, summary, content in tc.crawl(fetcher, pool, store, one_month_ago):
+                yield Article(title, '', published_date.strftime("%Y-%m-%d"), link, summary), content
+        store.close()
+
+    def stages(self):
+        import techcrunch_scrape as tc
+        return [partial(classify, classifier=tc.classifier),
+                partial(extract_companies, extractor=company_extractor(tc.funding_verbs))]
+
+    def sinks(self, output_dir):
+        # Each article is committed to the store as soon as it is classified
+        return super().sinks(output_dir) + [ArticleStoreSink(DEFAULT_ARTICLES_DB)]
+
+
+# Wayback Machine snapshots of the startups feed (test.py) over a date range
+class WaybackSource(Source):
+    name = 'wayback'
+
+    # archive_base can point at a local fake archive server for testing
+    def __init__(self, start_date, end_date, archive_base=None, **options):
+        super().__init__(**options)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.archive_base = archive_base
+
+    def records(self):
+        import test as wb
+        from dedupe import FingerprintStore
+        from wayback import ARCHIVE_BASE, BackfillCheckpoint, backfill_snapshots
+
+        wb.company_extractor.use_known_companies()
+        fetcher = wb.create_wayback_fetcher()
+        checkpoint = BackfillCheckpoint(wb.rss_url)
+        fingerprints = FingerprintStore()
+        snapshot_seen = partial(fingerprints.seen, 'wayback-snapshot')
+
+        for snapshot, days, response in backfill_snapshots(fetcher, wb.rss_url, self.start_date, self.end_date,
+                                                           checkpoint, self.archive_base or ARCHIVE_BASE,
+                                                           skip_digest=snapshot_seen):
+            new_entries = []
+            try:
+                yield from wb.parse_feed(response.content, None, fingerprints, new_entries)
+            except Exception:
+                log.exception("Error occurred parsing snapshot %s", response.url)
+                continue
+            # The snapshot's entries and days are recorded once its articles are stored
+            yield Barrier(partial(self.commit, fingerprints, checkpoint, snapshot, new_entries, days))
+        fingerprints.close()
+
+    @staticmethod
+    def commit(fingerprints, checkpoint, snapshot, new_entries, days):
+        for key, digest in new_entries:
+            fingerprints.record('wayback-entry', key, digest)
+        fingerprints.record('wayback-snapshot', snapshot.digest)
+        fingerprints.commit()
+        checkpoint.mark_done(days)
+
+    def sinks(self, output_dir):
+        return super().sinks(output_dir) + [ArticleStoreSink('articles_database.db', batch_size=500)]
+
+
+# Fortune Term Sheet newsletters in Gmail (email_scrape.py); yields Deal records
+class GmailNewsletterSource(Source):
+    name = 'gmail'
+
+    def records(self):
+        import email_scrape as gmail
+        from deal_parser import extract_venture_deals
+        from deal_store import DealStore
+
+        service = gmail.get_gmail_service()
+        store = DealStore()
+        emails, history_id, failed_ids = gmail.sync_new_emails(service, gmail.SENDER_EMAIL, store,
+                                                               max_results=gmail.NUM_EMAILS)
+        for email in emails:
+            deals = extract_venture_deals(email['body'], gmail.email_deal_date(email)) if email['body'] else []
+            store.add_deals(email['id'], deals)
+            yield from deals
+        gmail.save_sync_state(store, history_id, failed_ids)
+        store.close()
+
+    def sinks(self, output_dir):
+        fieldnames = ['company_name', 'company_URL', 'funding', 'investors', 'deal_date']
+        return [self.record_sink(output_dir, fieldnames)]
+
+
+SOURCE_NAMES = ['rss', 'techcrunch', 'wayback', 'gmail']
+
+
+# Function to build source plugins from their names; options are passed to every source
+def build_sources(names, start_date, end_date, **options):
+    factories = {
+        'rss': RSSFeedSource,
+        'techcrunch': TechCrunchCategorySource,
+        'wayback': partial(WaybackSource, start_date, end_date),
+        'gmail': GmailNewsletterSource,
+    }
+    if 'all' in names:
+        names = SOURCE_NAMES
+    return [factories[name](**options) for name in dict.fromkeys(names)]
+
+
+# Function to stream one source through its stages into its sinks, returning the
+# number of records written
+def run_source(source, output_dir):
+    stream = source.records()
+    for stage in source.stages():
+        stream = stage(stream)
+    sinks = source.sinks(output_dir)
+    written = 0
+    try:
+        for record in stream:
+            if isinstance(record, Barrier):
+                for sink in sinks:
+                    sink.flush()
+                record.on_commit()
+                continue
+            for sink in sinks:
+                sink.write(record)
+            written += 1
+            metrics.inc('pipeline_records_total', source=source.name)
+    finally:
+        for sink in sinks:
+            sink.close()
+    return written
+
+
+# Function to run several sources concurrently, returning {source name: records written}
+def run_sources(sources, output_dir='.'):
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(sources))) as executor:
+        futures = {executor.submit(run_source, source, output_dir): source for source in sources}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                results[source.name] = future.result()
+                log.info("%s: %d new records", source.name, results[source.name])
+            except Exception:
+                metrics.inc('pipeline_failures_total', source=source.name)
+                log.exception("%s: failed", source.name)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one or more funding-news sources through the pipeline.")
+    parser.add_argument('sources', nargs='+', choices=SOURCE_NAMES + ['all'], help="sources to run")
+    parser.add_argument('--output-dir', default='.', help="directory for the per-source record files")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="record file format (parquet needs pyarrow)")
+    parser.add_argument('--rotate-mb', type=float, help="start a new record file once one reaches this size")
+    parser.add_argument('--rotate-daily', action='store_true', help="write one record file per day")
+    parser.add_argument('--start', type=day_argument, default=datetime.now() - timedelta(days=7),
+                        help="first day of the Wayback backfill (YYYY-MM-DD)")
+    parser.add_argument('--end', type=day_argument, default=datetime.now(),
+                        help="last day of the Wayback backfill (YYYY-MM-DD)")
+    parser.add_argument('--metrics-file', help="write run metrics here (.json, or .prom for Prometheus text)")
+    parser.add_argument('--metrics-interval', type=float, help="also rewrite the metrics file every N seconds")
+    parser.add_argument('--log-level', help="DEBUG, INFO, WARNING or ERROR (default INFO)")
+    parser.add_argument('--log-json', action='store_true', default=None, help="log one JSON object per line")
+    args = parser.parse_args(argv)
+
+    rotate_bytes = int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None
+    sources = build_sources(args.sources, args.start, args.end, file_format=args.format,
+                            rotate_bytes=rotate_bytes, rotate_daily=args.rotate_daily)
+    with instrumented_run(args.metrics_file, args.metrics_interval, args.log_level, args.log_json):
+        run_sources(sources, args.output_dir)
+
+
+if __name__ == '__main__':
+    main()
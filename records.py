@@ -0,0 +1,63 @@
+import sys
+from typing import NamedTuple
+
+# Column names of an article record, in field order (CSV headers and the JSON/fingerprint format)
+ARTICLE_FIELDS = ["Title", "Company Name", "Published Date", "Link", "Summary", "Found Keywords"]
+
+
+# Function to intern a text value that repeats across many records (dates, keyword
+# lists, investor names), so every record holding it shares one string
+def intern_text(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+# A funding news article, shared by every scraper, pipeline stage, sink and store.
+# Slotted, so an article carries no per-instance dict, with its repetitive fields
+# interned. Iterating gives the fields in ARTICLE_FIELDS order, so sinks write it
+# and the stores insert it as a row directly.
+class Article:
+    __slots__ = ('title', 'company_name', 'published_date', 'link', 'summary', 'found_keywords')
+
+    def __init__(self, title, company_name='', published_date='', link='', summary='', found_keywords=''):
+        self.title = title
+        self.company_name = intern_text(company_name)
+        self.published_date = intern_text(published_date)
+        self.link = link
+        self.summary = summary
+        self.found_keywords = intern_text(found_keywords)
+
+    def __iter__(self):
+        yield self.title
+        yield self.company_name
+        yield self.published_date
+        yield self.link
+        yield self.summary
+        yield self.found_keywords
+
+    def __eq__(self, other):
+        return isinstance(other, Article) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"Article({self.title!r}, {self.company_name!r}, {self.published_date!r}, {self.link!r})"
+
+    # Dict keyed by ARTICLE_FIELDS, for JSON; from_dict reads one back
+    def to_dict(self):
+        return dict(zip(ARTICLE_FIELDS, self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*(data.get(field, '') for field in ARTICLE_FIELDS))
+
+
+# A venture deal parsed from a newsletter
+class Deal(NamedTuple):
+    company_name: str
+    url: str
+    funding: str
+    investors: str
+    deal_date: str
+
+    # Build a deal with its repetitive fields interned
+    @classmethod
+    def interned(cls, company_name, url, funding, investors, deal_date):
+        return cls(company_name, url, funding, intern_text(investors), intern_text(deal_date))
@@ -0,0 +1,124 @@
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from instrumentation import metrics
+
+log = logging.getLogger(__name__)
+
+# Status codes worth retrying; any other 4xx/5xx is treated as permanent
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Errors raised before a usable response arrived that are worth retrying
+RETRYABLE_ERRORS = (requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError)
+
+# (connect, read) timeouts in seconds applied to every request
+DEFAULT_TIMEOUT = (5, 30)
+
+# Outcomes of a single request attempt
+OK = "ok"
+RETRY = "retry"
+FAIL = "fail"
+
+
+# Function to classify the outcome of one attempt as OK, RETRY or FAIL
+def classify(response=None, error=None):
+    if error is not None:
+        return RETRY if isinstance(error, RETRYABLE_ERRORS) else FAIL
+    if response.status_code in RETRYABLE_STATUS:
+        return RETRY
+    if response.status_code >= 400:
+        return FAIL
+    return OK
+
+
+# Function to turn a Retry-After header (seconds or HTTP date) into a delay in seconds
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Decides how many times to retry and how long to wait between attempts
+class RetryPolicy:
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=30.0, max_retry_after=120.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    # Delay before the next attempt, or None if the request should not be retried.
+    # `attempt` is the number of attempts already made.
+    def next_delay(self, attempt, response=None, error=None):
+        if classify(response, error) != RETRY or attempt > self.max_retries:
+            return None
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+    # Jittered exponential delay after `attempt` failed attempts. Full jitter keeps
+    # concurrent retries against one host from synchronising.
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+# Function to make a single attempt, returning (response, error). Each attempt is timed
+# and counted per host, with its status (or error type) and the bytes downloaded.
+def attempt_request(url, session, timeout=DEFAULT_TIMEOUT, **kwargs):
+    host = urlsplit(url).hostname or ''
+    try:
+        with metrics.timer('http_request_seconds', host=host):
+            response = session.get(url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException as e:
+        metrics.inc('http_requests_total', host=host, status=type(e).__name__)
+        return None, e
+    metrics.inc('http_requests_total', host=host, status=response.status_code)
+    if not getattr(response, 'from_cache', False) and not kwargs.get('stream'):
+        metrics.inc('http_bytes_total', len(response.content), host=host)
+    return response, None
+
+
+# Function to describe a failed attempt for log messages
+def describe_failure(response, error):
+    if error is not None:
+        return str(error)
+    return f"HTTP {response.status_code}"
+
+
+# Function to make a request, retrying transient failures with jittered backoff.
+# Returns the response, or None once the request fails permanently.
+def fetch_with_retry(url, session, policy=DEFAULT_POLICY, timeout=DEFAULT_TIMEOUT, **kwargs):
+    attempt = 0
+    while True:
+        response, error = attempt_request(url, session, timeout, **kwargs)
+        attempt += 1
+        if classify(response, error) == OK:
+            return response
+        wait_time = policy.next_delay(attempt, response, error)
+        if wait_time is None:
+            metrics.inc('http_failures_total')
+            log.error("Failed to retrieve %s after %d attempt(s): %s", url, attempt, describe_failure(response, error))
+            return None
+        metrics.inc('http_retries_total')
+        log.warning("Error occurred: %s. Retrying in %.2f seconds...", describe_failure(response, error), wait_time)
+        time.sleep(wait_time)
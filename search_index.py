@@ -0,0 +1,229 @@
+# Full-text search over the scraped articles and newsletter deals.
+#
+#   python search_index.py "series b"
+#   python search_index.py --investor "sequoia capital" --since 2024-09-01
+#   python search_index.py fintech --company ledgerly --kind articles --limit 50
+#
+# Each store keeps an SQLite FTS5 index beside its table: articles_fts over article
+# titles, company names, summaries and keywords, deals_fts over deal company names,
+# investors and amounts. Triggers keep an index in step with every insert, update and
+# delete, so it fills during ingest with no extra work by the scrapers; a database that
+# predates the index is indexed once when it is first opened. Dates are filtered and
+# sorted on an indexed YYYY-MM-DD column (articles.published_day, filled at insert, and
+# deals.deal_date). Each store's results are ranked by BM25 (best first), or newest
+# first when no text is searched. BM25 scores depend on the corpus they come from, so
+# ranked results from several stores are interleaved by rank, not sorted by score.
+import argparse
+import logging
+import os
+from typing import NamedTuple
+
+from dates import day_argument, iso_day
+from instrumentation import instrumented_run, metrics
+
+log = logging.getLogger(__name__)
+
+# Indexed text columns of each table with their BM25 weights
+ARTICLE_SEARCH_COLUMNS = {'title': 10.0, 'company_name': 5.0, 'summary': 1.0, 'found_keywords': 1.0}
+DEAL_SEARCH_COLUMNS = {'company_name': 5.0, 'investors': 3.0, 'funding': 1.0}
+
+SEARCH_FIELDS = ['kind', 'source', 'date', 'company', 'title', 'funding', 'investors', 'link', 'score']
+
+
+# One search hit: an article or a deal in a common shape. Lower scores rank higher.
+class SearchResult(NamedTuple):
+    kind: str
+    source: str
+    date: str
+    company: str
+    title: str
+    funding: str
+    investors: str
+    link: str
+    score: float
+
+
+# Function to create the FTS5 index of a table and the triggers that maintain it, if
+# they do not exist yet. A new index is built from the rows already in the table.
+# The index refers to rows by rowid, which VACUUM may renumber: run --rebuild after one.
+def ensure_index(conn, table, columns):
+    index = f"{table}_fts"
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (index,)).fetchone():
+        return False
+    names = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+    with conn:
+        conn.execute(f"CREATE VIRTUAL TABLE {index} USING fts5({names}, content='{table}', "
+                     f"tokenize='unicode61 remove_diacritics 2')")
+        conn.execute(f"CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN "
+                     f"INSERT INTO {index}(rowid, {names}) VALUES (new.rowid, {new_values}); END")
+        conn.execute(f"CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN "
+                     f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.rowid, {old_values}); END")
+        conn.execute(f"CREATE TRIGGER {index}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+                     f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.rowid, {old_values}); "
+                     f"INSERT INTO {index}(rowid, {names}) VALUES (new.rowid, {new_values}); END")
+        conn.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+    log.info("Built the search index %s", index)
+    return True
+
+
+# Function to add a table's day column (date_column as YYYY-MM-DD, which inserts fill
+# from then on) if it is missing, filling it for the rows already stored, and index it.
+# A table whose dates are already YYYY-MM-DD passes the same column twice.
+def ensure_day_column(conn, table, date_column, day_column):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    with conn:
+        if day_column not in columns:
+            conn.create_function('iso_day', 1, iso_day, deterministic=True)
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {day_column} TEXT")
+            conn.execute(f"UPDATE {table} SET {day_column} = iso_day({date_column})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{day_column} ON {table}({day_column})")
+
+
+# Function to rebuild a table's index from scratch
+def rebuild_index(conn, table):
+    with conn:
+        conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+# Function to quote text as an FTS5 phrase, so user input is never read as query syntax
+def phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+# Function to build an FTS5 query: every word of terms (a trailing * matches any word
+# starting with it), with company and investor phrases in the columns that hold them
+def build_query(terms=None, company=None, investor=None, company_columns=None, investor_columns=None):
+    parts = []
+    for word in (terms or '').split():
+        if word.rstrip('*'):
+            parts.append(phrase(word.rstrip('*')) + ('*' if word.endswith('*') else ''))
+    if company:
+        parts.append('{' + ' '.join(company_columns) + '} : ' + phrase(company))
+    if investor:
+        parts.append('{' + ' '.join(investor_columns) + '} : ' + phrase(investor))
+    return ' AND '.join(parts)
+
+
+# What each kind of table is searched by: its index weights, the columns a company or
+# investor filter looks in, its indexed YYYY-MM-DD day column, and the columns returned,
+# in the order day, company, title, funding, investors, link
+class SearchTable(NamedTuple):
+    kind: str
+    table: str
+    weights: dict
+    company_columns: list
+    investor_columns: list
+    day_column: str
+    select: str
+
+
+ARTICLES = SearchTable('article', 'articles', ARTICLE_SEARCH_COLUMNS, ['company_name', 'title'], ['title', 'summary'],
+                       'articles.published_day',
+                       "articles.published_day, articles.company_name, articles.title, '', '', articles.link")
+DEALS = SearchTable('deal', 'deals', DEAL_SEARCH_COLUMNS, ['company_name'], ['investors'], 'deals.deal_date',
+                    "deals.deal_date, deals.company_name, '', deals.funding, deals.investors, COALESCE(deals.url, '')")
+
+
+# Function to search one table of a database: ranked by BM25 when there is text to
+# match, newest first otherwise, within an optional date range (YYYY-MM-DD strings)
+def search(conn, spec, source, terms=None, company=None, investor=None, since=None, until=None, limit=20):
+    query = build_query(terms, company, investor, spec.company_columns, spec.investor_columns)
+    index = f"{spec.table}_fts"
+    conditions, params = [], []
+    if query:
+        weights = ', '.join(str(weight) for weight in spec.weights.values())
+        sql = (f"SELECT {spec.select}, bm25({index}, {weights}) AS score FROM {index} "
+               f"JOIN {spec.table} ON {spec.table}.rowid = {index}.rowid")
+        conditions.append(f"{index} MATCH ?")
+        params.append(query)
+        order = "score"
+    else:
+        sql = f"SELECT {spec.select}, 0.0 AS score FROM {spec.table}"
+        order = f"{spec.day_column} DESC"
+    if since:
+        conditions.append(f"{spec.day_column} >= ?")
+        params.append(since)
+    if until:
+        conditions.append(f"{spec.day_column} <= ?")
+        params.append(until)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    with metrics.timer('search_seconds', table=spec.table):
+        rows = conn.execute(sql, params).fetchall()
+    return [SearchResult(spec.kind, source, row[0] or '', *row[1:]) for row in rows]
+
+
+# Function to print results one per line
+def print_results(results):
+    for result in results:
+        description = result.title or f"{result.funding} from {result.investors}".strip()
+        print(f"{result.date:<10}  {result.kind:<7}  {result.company[:28]:<28}  {description[:90]:<90}  {result.link}")
+
+
+def main(argv=None):
+    from article_store import DEFAULT_ARTICLES_DB, ArticleStore
+    from deal_store import DEFAULT_DEALS_DB, DealStore
+    from sinks import open_sink
+
+    parser = argparse.ArgumentParser(description="Search the scraped articles and newsletter deals.")
+    parser.add_argument('terms', nargs='*', help="words to search for (word* matches any word starting with it)")
+    parser.add_argument('--company', help="company name to look for")
+    parser.add_argument('--investor', help="investor name to look for")
+    parser.add_argument('--since', type=day_argument, help="earliest date (YYYY-MM-DD)")
+    parser.add_argument('--until', type=day_argument, help="latest date (YYYY-MM-DD)")
+    parser.add_argument('--kind', choices=['all', 'articles', 'deals'], default='all', help="what to search")
+    parser.add_argument('--limit', type=int, default=20, help="number of results")
+    parser.add_argument('--articles-db', nargs='+', default=[DEFAULT_ARTICLES_DB, 'articles_database.db'],
+                        help="article databases written by the TechCrunch scrapers")
+    parser.add_argument('--deals-db', default=DEFAULT_DEALS_DB, help="deal store written by email_scrape.py")
+    parser.add_argument('--output', help="also write the results to this CSV (or .parquet) file")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the indexes first (e.g. after a VACUUM)")
+    args = parser.parse_args(argv)
+
+    databases = []
+    if args.kind != 'deals':
+        databases += [(path, ArticleStore, ARTICLES) for path in args.articles_db]
+    if args.kind != 'articles':
+        databases.append((args.deals_db, DealStore, DEALS))
+
+    since = args.since.strftime("%Y-%m-%d") if args.since else None
+    until = args.until.strftime("%Y-%m-%d") if args.until else None
+    terms = ' '.join(args.terms)
+    ranked = bool(terms or args.company or args.investor)
+    with instrumented_run(log_level=os.environ.get('SCRAPER_LOG_LEVEL', 'WARNING')):
+        results = []
+        for path, store_class, spec in databases:
+            if not os.path.exists(path):
+                log.warning("Database %s not found. Skipping.", path)
+                continue
+            store = store_class(path)  # Opening a store builds its index if it has none
+            if args.rebuild:
+                rebuild_index(store.conn, spec.table)
+            source = os.path.splitext(os.path.basename(path))[0]
+            found = search(store.conn, spec, source, terms, args.company, args.investor,
+                           since, until, args.limit)
+            # BM25 scores of different databases are not comparable, so ranked results
+            # are merged by their rank within their own database
+            results += [(rank if ranked else 0, result) for rank, result in enumerate(found)]
+            store.close()
+
+    if ranked:
+        results.sort(key=lambda item: (item[0], item[1].score))
+    else:
+        results.sort(key=lambda item: item[1].date, reverse=True)
+    results = [result for _, result in results[:args.limit]]
+    print_results(results)
+
+    if args.output:
+        sink = open_sink(args.output, SEARCH_FIELDS, append=False)
+        for result in results:
+            sink.write(result)
+        sink.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import csv
+import glob
+import os
+import re
+from datetime import date
+
+from instrumentation import metrics
+
+
+# Base class for sinks that stream records into files as they are produced, never
+# holding more than one batch in memory. Files are opened on the first write, so a
+# run that produces nothing creates nothing.
+#
+# append=True continues the existing file; append=False replaces it, deleting any
+# numbered segments an earlier run left for the same day.
+# rotate_bytes starts a new numbered segment (name.1.csv, name.2.csv, ...) once the
+# current one reaches that size; rotate_daily puts the date in the file name
+# (name-2024-09-01.csv) and starts a new file when the date changes.
+class RotatingFileSink:
+    def __init__(self, path, fieldnames, append=True, rotate_bytes=None, rotate_daily=False):
+        self.stem, self.ext = os.path.splitext(path)
+        self.fieldnames = fieldnames
+        self.append = append
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.day = None
+        self.segment = 0
+        self.current_path = None
+        self.written = 0
+
+    def segment_path(self, day, segment):
+        stem = f"{self.stem}-{day.isoformat()}" if self.rotate_daily else self.stem
+        return f"{stem}.{segment}{self.ext}" if segment else f"{stem}{self.ext}"
+
+    # Paths of a day's existing numbered segments by segment number
+    def existing_segments(self, day):
+        stem, ext = os.path.splitext(self.segment_path(day, 0))
+        pattern = re.compile(re.escape(stem) + r'\.(\d+)' + re.escape(ext) + '$')
+        return {int(match.group(1)): match.group(0)
+                for match in map(pattern.match, glob.glob(glob.escape(stem) + '.*' + ext)) if match}
+
+    # Highest existing segment number for a day, so appends continue the latest file
+    def last_segment(self, day):
+        return max(self.existing_segments(day), default=0)
+
+    def needs_rotation(self):
+        if self.rotate_daily and self.day != date.today():
+            return True
+        return self.rotate_bytes is not None and self.current_size() >= self.rotate_bytes
+
+    def write(self, record):
+        if self.current_path is None:
+            self.day = date.today()
+            self.segment = self.last_segment(self.day) if self.append else 0
+            self.open_segment(append=self.append)
+        elif self.needs_rotation():
+            metrics.inc('sink_rotations_total', format=self.format)
+            self.close_file()
+            today = date.today()
+            self.segment = 0 if today != self.day else self.segment + 1
+            self.day = today
+            self.open_segment(append=self.append)
+        if isinstance(record, dict):
+            record = [record.get(field, "") for field in self.fieldnames]
+        with metrics.timer('sink_write_seconds', format=self.format):
+            self.write_row(record)
+        metrics.inc('sink_rows_total', format=self.format)
+        self.written += 1
+
+    def open_segment(self, append):
+        if not append and self.segment == 0:
+            for path in self.existing_segments(self.day).values():
+                os.remove(path)  # Left by an earlier run this one replaces
+        self.current_path = self.segment_path(self.day, self.segment)
+        self.open_file(self.current_path, append)
+
+    def close(self):
+        if self.current_path is not None:
+            self.close_file()
+
+    # Implemented by subclasses
+    def open_file(self, path, append):
+        raise NotImplementedError
+
+    def write_row(self, row):
+        raise NotImplementedError
+
+    def current_size(self):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close_file(self):
+        raise NotImplementedError
+
+
+# Streaming CSV sink; the header is written whenever a file is started from empty
+class CSVSink(RotatingFileSink):
+    format = 'csv'
+
+    def open_file(self, path, append):
+        is_new = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if is_new:
+            self.writer.writerow(self.fieldnames)
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+    def current_size(self):
+        return self.file.tell()
+
+    def flush(self):
+        if self.current_path is not None:
+            self.file.flush()
+
+    def close_file(self):
+        self.file.close()
+
+
+# Columnar Parquet sink (requires pyarrow). Rows are buffered and written as one row
+# group per batch_size rows. Parquet files cannot be reopened for appending, so in
+# append mode an existing file is left alone and output continues in the next segment.
+class ParquetSink(RotatingFileSink):
+    format = 'parquet'
+
+    def __init__(self, path, fieldnames, batch_size=10000, **options):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from None
+        super().__init__(path, fieldnames, **options)
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.schema = pyarrow.schema([(field, pyarrow.string()) for field in fieldnames])
+        self.batch_size = batch_size
+        self.rows = []
+        self.buffered_bytes = 0  # Rough size of the buffered rows, counted toward rotate_bytes
+
+    def open_file(self, path, append):
+        while append and os.path.exists(self.current_path):
+            self.segment += 1
+            self.current_path = path = self.segment_path(self.day, self.segment)
+        self.writer = self.pq.ParquetWriter(path, self.schema)
+
+    def write_row(self, row):
+        self.rows.append(row)
+        self.buffered_bytes += sum(len(str(value)) for value in row if value is not None)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    # Bytes written so far plus the uncompressed size of the rows not yet written, so
+    # rotation does not wait for a whole batch to be flushed
+    def current_size(self):
+        return os.path.getsize(self.current_path) + self.buffered_bytes
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        arrays = [self.pa.array([None if value is None else str(value) for value in column], self.pa.string())
+                  for column in columns]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows = []
+        self.buffered_bytes = 0
+
+    def close_file(self):
+        self.flush()
+        self.writer.close()
+
+
+# Function to open a sink for a path, choosing Parquet or CSV by its extension
+def open_sink(path, fieldnames, **options):
+    if path.endswith('.parquet'):
+        return ParquetSink(path, fieldnames, **options)
+    return CSVSink(path, fieldnames, **options)
@@ -1,186 +1,264 @@
-import requests
+import logging
 from bs4 import BeautifulSoup
-import csv
+from concurrent.futures import as_completed
 from datetime import datetime, timedelta
-import re
-import json
-import os
-import time
-import random
+from functools import partial
+from fetcher import Fetcher, create_session
+from http_cache import HTTPCache
+from classifier import FundingClassifier
+from parsing import MAX_ARTICLE_BYTES, ParsePool, extract_article_text, stream_article_text
+from article_store import ArticleStore
+from frontier import CrawlFrontier
+from records import ARTICLE_FIELDS, Article
+from sinks import CSVSink
+from company_names import CompanyNameExtractor
+from instrumentation import instrumented_run, metrics
+
+log = logging.getLogger(__name__)
 
 # TechCrunch base URL
 base_url = "https://techcrunch.com/category/startups/page/"
 
-# Function to load existing articles database
-def load_articles_database():
-    if os.path.exists("articles_database.json"):
-        with open("articles_database.json", 'r') as f:
-            return json.load(f)
-    return []
-
-# Function to save updated articles database
-def save_articles_database(articles):
-    with open("articles_database.json", 'w') as f:
-        json.dump(articles, f)
-
-# Load existing articles
-existing_articles = load_articles_database()
-existing_links = set(article['Link'] for article in existing_articles)
-
 # Modify the keywords to include more variations
 funding_keywords = ["funding", "raises", "raised", "raising", "series", "seed", "investment", "invested", "investing", "valuation", "round", "capital", "venture", "equity", "financing"]
 currency_symbols = ["€", "$", "£", "¥"]  # Add more currency symbols if needed
-
-# List to hold new articles
-new_articles = []
-
-# Get the date one month ago
-one_month_ago = datetime.now() - timedelta(days=30)
+classifier = FundingClassifier(funding_keywords, currency_symbols)  # Compiled once, one scan per article
+funding_verbs = ["raises", "secures", "lands", "gets", "closes", "announces", "completes"]
+company_extractor = CompanyNameExtractor(funding_verbs)
 
 # Set a maximum number of pages to scrape
 MAX_PAGES = 15
 
-# Function to implement exponential backoff
-def exponential_backoff(attempt):
-    return min(30, 2 ** attempt + random.uniform(0, 1))
-
-# Function to make a request with rate limiting
-def make_request(url, session, attempt=0):
-    try:
-        response = session.get(url)
-        response.raise_for_status()
-        return response
-    except requests.exceptions.RequestException as e:
-        if attempt < 5:  # Max 5 retries
-            wait_time = exponential_backoff(attempt)
-            print(f"Error occurred: {e}. Retrying in {wait_time:.2f} seconds...")
-            time.sleep(wait_time)
-            return make_request(url, session, attempt + 1)
-        else:
-            print(f"Failed to retrieve {url} after 5 attempts.")
-            return None
-
-# Create a session for persistent connections
-session = requests.Session()
-
-page = 1
-stop_scraping = False
-while page <= MAX_PAGES and not stop_scraping:
-    url = f"{base_url}{page}/"
-    print(f"Scraping page {page}: {url}")
-    
-    response = make_request(url, session)
-    if not response:
-        print(f"Failed to retrieve page {page}. Moving to next page.")
-        page += 1
-        continue
-    
-    soup = BeautifulSoup(response.content, 'html.parser')
-    articles = soup.find_all('div', class_='post-block')
-    
-    print(f"Found {len(articles)} articles on page {page}")
-    
-    if not articles:
-        print(f"No articles found on page {page}. Moving to next page.")
-        page += 1
-        continue  # Move to the next page instead of breaking the loop
-    
-    for article in articles:
+# Concurrency and politeness knobs for the fetch engine
+CONCURRENCY = 8  # Maximum number of requests in flight at once
+REQUESTS_PER_SECOND = 1.0  # Rate budget per host
+LISTING_BATCH = 3  # Number of listing pages fetched ahead at once
+PARSE_WORKERS = None  # Article parsing processes (None = one per CPU, 0 = parse inline)
+STREAM_ARTICLES = True  # Parse articles as they download and stop reading once classified
+
+# Function to extract (title, link, published_date, summary) from a listing page
+@metrics.timed('parse_seconds', func='parse_listing')
+def parse_listing(content):
+    soup = BeautifulSoup(content, 'html.parser')
+    listing = []
+    for article in soup.find_all('div', class_='post-block'):
+        title_element = article.find('h2', class_='post-block__title')
         title = title_element.text.strip()
         link = title_element.find('a')['href']
         date_string = article.select_one('time')['datetime'].split('T')[0]
         summary = article.select_one('p.wp-block-post-excerpt__excerpt').text.strip()
         published_date = datetime.strptime(date_string, '%Y-%m-%d')
-        
-        print(f"\nProcessing article: {title} (Published: {published_date.strftime('%Y-%m-%d')})")
-        
-        if published_date < one_month_ago:
-            print(f"Reached articles older than one month on page {page}. Stopping.")
+        listing.append((title, link, published_date, summary))
+    return listing
+
+# Function to classify an article's extracted text, returning the article record if it matches
+def process_article(title, link, published_date, summary, content):
+    log.debug("Processing article: %s (Published: %s)", title, published_date.strftime('%Y-%m-%d'))
+    if not content:
+        log.warning("Couldn't find article content: %s", link)
+
+    # Search for keywords and currency symbols
+    found_keywords, found_currency = classifier.classify(content)
+
+    log.debug("Found keywords: %s; currency symbols: %s", found_keywords, found_currency)
+
+    if not (found_keywords or found_currency):  # Changed from 'and' to 'or' to loosen criteria
+        log.debug("Article does not match criteria. Skipping.")
+        return None
+
+    # Extract company name from title
+    company_name = company_extractor.extract(title)
+
+    log.info("New matched article: %s (company: %s, keywords: %s)", title, company_name, ", ".join(found_keywords))
+    return Article(title, company_name, published_date.strftime("%Y-%m-%d"), link, summary, ", ".join(found_keywords))
+
+# Function to fetch and extract the articles in pending (link -> (title, link,
+# published_date, summary)), yielding (title, link, published_date, summary, content)
+# as each one is ready. Articles that cannot be downloaded are recorded in the frontier.
+def fetch_articles(fetcher, pool, pending, frontier):
+    if STREAM_ARTICLES:
+        # Each article is parsed in its fetch thread as it downloads, and the
+        # download stops at the end of the article body, once the text holds
+        # both a funding keyword and a currency symbol, or at MAX_ARTICLE_BYTES
+        stream = partial(stream_article_text, decided=classifier.decided, max_bytes=MAX_ARTICLE_BYTES)
+        for link, content in fetcher.fetch_all(pending, consume=stream):
+            if content is None:
+                frontier.fetch_failed(*pending[link])
+                continue
+            frontier.fetched(link)
+            yield (*pending[link], content)
+    else:
+        # Fetch full articles concurrently, handing each body to the parse pool as it
+        # arrives so parsing overlaps with the remaining downloads
+        parse_futures = {}
+        for link, article_response in fetcher.fetch_all(pending):
+            if not article_response:
+                frontier.fetch_failed(*pending[link])
+                continue
+            frontier.fetched(link)
+            parse_futures[pool.submit(extract_article_text, article_response.content)] = link
+
+        for future in as_completed(parse_futures):
+            yield (*pending[parse_futures[future]], future.result())
+
+# Function to crawl the category pages, yielding (title, link, published_date, summary,
+# content) for every article not already in the store.
+#
+# Paging stops at articles older than one_month_ago, after MAX_PAGES, or as soon as the
+# crawl catches up with what is already stored: a page holding the newest article of the
+# last completed crawl (articles below it are not fetched again), or a page whose links
+# are all known, unless a listing page has failed since the last clean crawl. A daily
+# run therefore reads one or two listing pages. The frontier is checkpointed after every page, so when a
+# crawl was interrupted the next one, once caught up at the top of the listing, jumps
+# to the page where it stopped and carries on from there.
+def crawl(fetcher, pool, store, one_month_ago, frontier=None):
+    if frontier is None:
+        frontier = CrawlFrontier(base_url)
+    resume_page, resume_date = frontier.resume_page, frontier.resume_date
+    if resume_page:
+        log.info("Previous crawl was interrupted; resuming at page %d once caught up.", resume_page)
+    resuming = False  # Paging through pages the interrupted crawl already handled
+    newest = (None, None)  # Newest article seen this run
+    listing_failed = False  # A listing page could not be read, so its articles were missed
+    # After a missed listing page, known pages may sit above articles never fetched, so
+    # only the previous newest article (or the cutoff) ends the crawl
+    trust_known_pages = not frontier.listing_incomplete
+    page = 1
+    # Incremental runs usually stop on the first page, so read ahead only once a crawl
+    # keeps finding new articles
+    batch_size = 1 if frontier.newest_link else LISTING_BATCH
+    stop_scraping = False
+    queued_links = set()  # Links already fetched during this run
+
+    # Articles that failed to download last time lie above the point where this crawl
+    # will stop, so they are fetched first
+    retries = {article[1]: article for article in frontier.retries(one_month_ago) if article[1] not in store}
+    if retries:
+        log.info("Retrying %d article(s) that failed to download last time.", len(retries))
+        queued_links.update(retries)
+        yield from fetch_articles(fetcher, pool, retries, frontier)
+        frontier.save()
+
+    while page <= MAX_PAGES and not stop_scraping:
+        # Fetch a batch of listing pages concurrently, then process them in page order
+        batch = range(page, min(page + batch_size, MAX_PAGES + 1))
+        page_urls = {f"{base_url}{p}/": p for p in batch}
+        log.info("Scraping pages %d-%d", batch[0], batch[-1])
+        listing_responses = {page_urls[url]: response for url, response in fetcher.fetch_all(page_urls)}
+        next_page = batch[-1] + 1  # Move to the next batch of pages
+
+        for page in batch:
+            response = listing_responses[page]
+            if not response:
+                log.warning("Failed to retrieve page %d. Moving to next page.", page)
+                listing_failed = True
+                frontier.listing_incomplete = True  # Saved with the next checkpoint
+                continue
+
+            articles = parse_listing(response.content)
+
+            log.debug("Found %d articles on page %d", len(articles), page)
+
+            if not articles:
+                log.warning("No articles found on page %d. Moving to next page.", page)
+                continue  # Move to the next page instead of breaking the loop
+
+            if newest[0] is None:
+                newest = articles[0][1], articles[0][2]
+
+            pending = {}
+            known = 0
+            reached_previous = False
+            for title, link, published_date, summary in articles:
+                if published_date < one_month_ago:
+                    log.info("Reached articles older than one month on page %d. Stopping.", page)
+                    stop_scraping = True
+                    break  # We've reached articles older than one month, stop processing this page
+
+                if link == frontier.newest_link:
+                    reached_previous = True  # Everything below was seen by the last completed crawl
+
+                # Matched articles are in the store; the rest are known only by position
+                if reached_previous or link in store or link in queued_links:
+                    log.debug("Article already in database. Skipping: %s", title)
+                    known += 1
+                    continue  # Skip if this article is already in the database
+
+                queued_links.add(link)
+                pending[link] = (title, link, published_date, summary)
+
+            yield from fetch_articles(fetcher, pool, pending, frontier)
+
+            if stop_scraping:
+                break
+
+            # The caller has stored this page's articles by the time the generator resumes,
+            # and the ones that failed to download are kept in the frontier for the next
+            # crawl. A pending resume point is kept until the crawl has jumped to it.
+            oldest = articles[-1][2]
+            if not resume_page:
+                frontier.page_done(page, oldest)
+            if resuming and oldest < resume_date:
+                resuming = False  # Past the pages the interrupted crawl handled
+
+            if resuming or not (reached_previous or (trust_known_pages and known == len(articles))):
+                continue
+            if resume_page and not reached_previous:
+                next_page = max(resume_page, page + 1)
+                log.info("Caught up on page %d; resuming the interrupted crawl at page %d.", page, next_page)
+                resume_page, resuming = None, True
+                break
+            log.info("Caught up with articles already stored on page %d. Stopping.", page)
             stop_scraping = True
-            break  # We've reached articles older than one month, stop processing this page
-        
-        if link in existing_links:
-            print("Article already in database. Skipping.")
-            continue  # Skip if this article is already in the database
-        
-        # Fetch full article content
-        article_response = make_request(link, session)
-        if not article_response:
-            continue
-        
-        article_soup = BeautifulSoup(article_response.content, 'html.parser')
-        content_element = article_soup.find('div', class_='article-content')
-        
-        if not content_element:
-            print("Couldn't find article content. Trying alternative method.")
-            content_element = article_soup.find('div', class_='article-container')
-        
-        content = content_element.text if content_element else ""
-        
-        # Print the first 200 characters of content for debugging
-        print(f"Content preview: {content[:200]}...")
-        
-        # Search for keywords and currency symbols
-        found_keywords = [keyword for keyword in funding_keywords if re.search(r'\b' + re.escape(keyword) + r'\b', content, re.IGNORECASE)]
-        found_currency = any(symbol in content for symbol in currency_symbols)
-        
-        print(f"Found keywords: {found_keywords}")
-        print(f"Found currency symbols: {found_currency}")
-        
-        if found_keywords or found_currency:  # Changed from 'and' to 'or' to loosen criteria
-            # Extract company name from title
-            company_name = ""
-            funding_verbs = ["raises", "secures", "lands", "gets", "closes", "announces", "completes"]
-            verb_match = re.search(r'\b(' + '|'.join(funding_verbs) + r')\b', title, re.IGNORECASE)
-            if verb_match:
-                verb_position = verb_match.start()
-                name_match = re.findall(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', title[:verb_position])
-                if name_match:
-                    company_name = name_match[-1]  # Take the last match, closest to the verb
-
-            new_article = {
-                "Title": title,
-                "Company Name": company_name,
-                "Published Date": published_date.strftime("%Y-%m-%d"),
-                "Link": link,
-                "Summary": summary,
-                "Found Keywords": ", ".join(found_keywords)
-            }
-            new_articles.append(new_article)
-            existing_articles.append(new_article)
-            existing_links.add(link)
-            
-            print(f"New matched article: {title}")
-            print(f"Company Name: {company_name}")
-            print(f"Keywords found: {', '.join(found_keywords)}")
-            print("---")
-        else:
-            print("Article does not match criteria. Skipping.")
-        
-        time.sleep(random.uniform(1, 3))  # Random delay between article requests
-    
-    page += 1  # Move to the next page
-    
-    if page > MAX_PAGES:
-        print(f"Reached maximum number of pages ({MAX_PAGES}). Stopping.")
-    
-    time.sleep(random.uniform(3, 7))  # Random delay between page requests
-
-print(f"Total new articles found: {len(new_articles)}")
-
-# Save updated database
-save_articles_database(existing_articles)
-
-# Write new articles to CSV
-if new_articles:
+            break
+
+        page = next_page
+        batch_size = min(LISTING_BATCH, batch_size * 2)
+
+        if page > MAX_PAGES and not stop_scraping:
+            log.info("Reached maximum number of pages (%d). Stopping.", MAX_PAGES)
+
+    # After a listing page failed, the previous newest article stays the stopping point,
+    # so the next crawl walks down past the missed page again
+    frontier.complete(*newest, clean=not listing_failed)
+
+def main():
+    # Open the article store, importing the old JSON database on first run
+    store = ArticleStore()
+    store.migrate_json()
+
+    company_extractor.use_known_companies()
+
+    # Get the date one month ago
+    one_month_ago = datetime.now() - timedelta(days=30)
+
+    # Fetch engine sharing one pooled session, rate limited per host instead of fixed sleeps;
+    # failed requests back off without blocking the rest of the crawl.
+    # Unchanged listing pages and articles are revalidated and served from the local HTTP cache
+    fetcher = Fetcher(create_session(CONCURRENCY, cache=HTTPCache()), concurrency=CONCURRENCY, rate=REQUESTS_PER_SECOND)
+    # New articles are appended to today's CSV as they are found, so a second run on
+    # the same day adds to the file instead of replacing it
     csv_file = f"new_funding_articles_{datetime.now().strftime('%Y-%m-%d')}.csv"
-    with open(csv_file, "w", newline="", encoding="utf-8") as csvfile:
-        fieldnames = ["Title", "Company Name", "Published Date", "Link", "Summary", "Found Keywords"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(new_articles)
-    print(f"New articles have been written to {csv_file}")
-else:
-    print("No new articles found matching the keywords.")
-
-print(f"Total articles in database: {len(existing_articles)}")
\ No newline at end of file
+    sink = CSVSink(csv_file, ARTICLE_FIELDS)
+    with ParsePool(0 if STREAM_ARTICLES else PARSE_WORKERS) as pool:  # Streamed articles are parsed while fetched
+        for article in crawl(fetcher, pool, store, one_month_ago):
+            new_article = process_article(*article)
+            if new_article:
+                store.add(new_article)  # Committed immediately, so an interrupted crawl keeps it
+                sink.write(new_article)
+                sink.flush()
+    sink.close()
+
+    log.info("Total new articles found: %d", sink.written)
+
+    if sink.written:
+        log.info("New articles have been written to %s", csv_file)
+    else:
+        log.info("No new articles found matching the keywords.")
+
+    log.info("Total articles in database: %d", len(store))
+    store.close()
+
+if __name__ == '__main__':
+    with instrumented_run():
+        main()
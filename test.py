@@ -1,34 +1,60 @@
 import feedparser
-import requests
+import logging
 import re
-import csv
 import sqlite3
-from bs4 import BeautifulSoup
-from waybackpy import WaybackMachineAvailabilityAPI
-from datetime import datetime, timedelta
-import time
+from datetime import datetime
+from functools import partial
+from fetcher import Fetcher, create_session
+from http_cache import HTTPCache
+from classifier import FundingClassifier
+from parsing import ParsePool, html_to_text
+from dedupe import FingerprintStore, entry_digest, entry_key
+from wayback import ARCHIVE_BASE, BackfillCheckpoint, backfill_snapshots
+from records import ARTICLE_FIELDS, Article
+from article_store import ARTICLE_COLUMNS, INSERT_ARTICLE, article_row
+from search_index import ARTICLE_SEARCH_COLUMNS, ensure_day_column, ensure_index
+from sinks import CSVSink
+from company_names import CompanyNameExtractor
+from instrumentation import instrumented_run, metrics
+
+log = logging.getLogger(__name__)
 
 # TechCrunch RSS feed URL
 rss_url = "https://techcrunch.com/category/startups/feed/"
 
+# Archived snapshots never change, so cached copies are reused without revalidation
+wayback_snapshot_pattern = re.compile(r'://web\.archive\.org/web/\d{14}')
+
+# Concurrent snapshot downloads and the request rate allowed against the archive
+WAYBACK_CONCURRENCY = 4
+WAYBACK_REQUESTS_PER_SECOND = 1.0
+
+# Number of snapshots ingested per database transaction
+COMMIT_EVERY = 30
+
+# Summary-cleaning processes (None = one per CPU, 0 = parse inline)
+PARSE_WORKERS = None
+
 # Database setup
 def setup_database():
     conn = sqlite3.connect('articles_database.db')
+    # WAL with synchronous=NORMAL only fsyncs at checkpoints, which suits bulk ingest
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
     c = conn.cursor()
     c.execute('''CREATE TABLE IF NOT EXISTS articles
                  (title TEXT, company_name TEXT, published_date TEXT, 
                   link TEXT PRIMARY KEY, summary TEXT, found_keywords TEXT)''')
     conn.commit()
+    # Indexed day of each article, and a full-text index kept current by triggers
+    ensure_day_column(conn, 'articles', 'published_date', 'published_day')
+    ensure_index(conn, 'articles', ARTICLE_SEARCH_COLUMNS)
     return conn
 
-# Function to parse feed and extract articles
-def parse_feed(feed_content):
-    articles = []
-    feed = feedparser.parse(feed_content)
-
-    print(f"Total entries in feed: {len(feed.entries)}")
-
-    funding_keywords = [
+# Funding phrase patterns matched against each entry
+funding_keywords = [
     r"raised [$€£¥]?[0-9,.]+(?:[MB]| million| billion)? in a Series [A-Z] round", 
     r"raised [$€£¥]?[0-9,.]+(?:[MB]| million| billion)? in a seed round", 
     r"closed a [$€£¥]?[0-9,.]+(?:[MB]| million| billion)? Series [A-Z] round", 
@@ -45,110 +71,144 @@ def parse_feed(feed_content):
     r"raised over [$€£¥]?[0-9,.]+(?:[MB]| million| billion)? in Series [A-Z]", 
     r"received a [$€£¥]?[0-9,.]+(?:[MB]| million| billion)? investment from"]
 
-    currency_symbols = ["€", "$", "£", "¥"]  # Add more currency symbols if needed
+currency_symbols = ["€", "$", "£", "¥"]  # Add more currency symbols if needed
 
-    for entry in feed.entries:
+# Phrase patterns are real regular expressions, compiled once into a single matcher
+classifier = FundingClassifier(funding_keywords, currency_symbols, regex=True)
+funding_verbs = ["raises", "secures", "lands", "gets", "closes", "announces", "completes"]
+company_extractor = CompanyNameExtractor(funding_verbs)
+
+# Function to parse feed and extract articles
+# (summaries are cleaned in the parse pool when one is given)
+# Entries already fingerprinted by an earlier snapshot are skipped before any cleaning
+# or classification. The (key, digest) of each new entry is appended to new_entries, for
+# the caller to record in `fingerprints` once the articles are stored.
+def parse_feed(feed_content, pool=None, fingerprints=None, new_entries=None):
+    articles = []
+    with metrics.timer('parse_seconds', func='feedparser'):
+        feed = feedparser.parse(feed_content)
+
+    log.debug("Total entries in feed: %d", len(feed.entries))
+
+    entries = feed.entries
+    if fingerprints is not None:
+        entries = []
+        for entry in feed.entries:
+            key, digest = entry_key(entry), entry_digest(entry)
+            if not fingerprints.seen('wayback-entry', key, digest):
+                if new_entries is not None:
+                    new_entries.append((key, digest))
+                entries.append(entry)
+        log.debug("Skipping %d entries seen in earlier snapshots.", len(feed.entries) - len(entries))
+
+    # Remove HTML tags from every summary in one batch
+    raw_summaries = [entry.get('summary', '') for entry in entries]
+    summaries = pool.map(html_to_text, raw_summaries) if pool else [html_to_text(s) for s in raw_summaries]
+
+    for entry, summary in zip(entries, summaries):
         title = entry.title
-        summary = entry.get('summary', '')
         link = entry.link
         published_date = entry.published
 
-        summary = BeautifulSoup(summary, "html.parser").get_text()
-
-        found_keywords = [keyword for keyword in funding_keywords if re.search(r'\b' + re.escape(keyword) + r'\b', summary + title, re.IGNORECASE)]
-        found_currency = any(symbol in summary + title for symbol in currency_symbols)
+        found_keywords, found_currency = classifier.classify(summary + " " + title)
 
         if found_keywords or found_currency:
-            company_name = ""
-            funding_verbs = ["raises", "secures", "lands", "gets", "closes", "announces", "completes"]
-            
-            verb_match = re.search(r'\b(' + '|'.join(funding_verbs) + r')\b', title, re.IGNORECASE)
-            if verb_match:
-                verb_position = verb_match.start()
-                name_match = re.findall(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', title[:verb_position])
-                if name_match:
-                    company_name = name_match[-1]  # Take the last match, closest to the verb
-
-            articles.append({
-                "Title": title,
-                "Company Name": company_name,
-                "Published Date": published_date,
-                "Link": link,
-                "Summary": summary[:200],  # Truncate summary for brevity
-                "Found Keywords": ", ".join(found_keywords)
-            })
+            company_name = company_extractor.extract(title)
+
+            articles.append(Article(title, company_name, published_date, link,
+                                    summary[:200],  # Truncate summary for brevity
+                                    ", ".join(found_keywords)))
 
     return articles
 
-# Function to get historical RSS feeds
-def get_historical_feeds(start_date, end_date, conn):
+# Function to create the fetcher used for Wayback downloads
+def create_wayback_fetcher():
     user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    availability_api = WaybackMachineAvailabilityAPI(rss_url, user_agent)
+    # Snapshots already downloaded by an earlier (possibly interrupted) run come from the cache
+    session = create_session(WAYBACK_CONCURRENCY, cache=HTTPCache(), immutable_urls=wayback_snapshot_pattern)
+    session.headers['User-Agent'] = user_agent
+    # Be respectful to the Wayback Machine servers
+    return Fetcher(session, concurrency=WAYBACK_CONCURRENCY, rate=WAYBACK_REQUESTS_PER_SECOND)
+
+# Function to get historical RSS feeds: one CDX listing for the whole range, then
+# concurrent downloads of the distinct snapshots, resuming from the checkpoint
+def get_historical_feeds(start_date, end_date, conn, pool=None, archive_base=ARCHIVE_BASE):
+    fetcher = create_wayback_fetcher()
+    checkpoint = BackfillCheckpoint(rss_url)
+    fingerprints = FingerprintStore()
+    snapshot_seen = partial(fingerprints.seen, 'wayback-snapshot')
 
     new_articles = 0
-    current_date = start_date
+    uncommitted_days = []
+    uncommitted = 0
 
-    while current_date <= end_date:
-        print(f"Fetching RSS feed for {current_date.strftime('%Y-%m-%d')}...")
+    for snapshot, days, response in backfill_snapshots(fetcher, rss_url, start_date, end_date, checkpoint,
+                                                       archive_base, skip_digest=snapshot_seen):
+        log.info("Processing snapshot %s (covers %s)", response.url, ', '.join(days))
+        new_entries = []
         try:
-            snapshot = availability_api.near(current_date.strftime("%Y%m%d"))
-            if snapshot:
-                print(f"Found snapshot: {snapshot.archive_url}")
-                response = requests.get(snapshot.archive_url)
-                if response.status_code == 200:
-                    articles = parse_feed(response.content)
-                    new_articles += add_articles_to_db(articles, conn)
-                    print(f"Found {len(articles)} articles, {new_articles} new.")
-                else:
-                    print(f"Failed to retrieve RSS feed. Status code: {response.status_code}")
-            else:
-                print("No snapshots found for this date.")
-        except Exception as e:
-            print(f"Error occurred: {str(e)}")
-
-        current_date += timedelta(days=1)
-        time.sleep(1)  # Be respectful to the Wayback Machine servers
+            articles = parse_feed(response.content, pool, fingerprints, new_entries)
+        except Exception:
+            log.exception("Error occurred parsing snapshot %s", response.url)
+            continue
+        added = add_articles_to_db(articles, conn)
+        # Entries are fingerprinted only once their articles are in the database
+        for key, digest in new_entries:
+            fingerprints.record('wayback-entry', key, digest)
+        fingerprints.record('wayback-snapshot', snapshot.digest)
+        new_articles += added
+        uncommitted_days.extend(days)
+        uncommitted += 1
+        # Days and fingerprints are only saved once their articles are committed
+        if uncommitted >= COMMIT_EVERY:
+            conn.commit()
+            fingerprints.commit()
+            checkpoint.mark_done(uncommitted_days)
+            uncommitted_days = []
+            uncommitted = 0
+        log.info("Found %d articles, %d new.", len(articles), added)
 
+    conn.commit()
+    fingerprints.close()
+    checkpoint.mark_done(uncommitted_days)
     return new_articles
 
-# Function to add articles to the database
+# Function to add articles to the database in one statement, skipping links already
+# stored. Returns the number of rows actually inserted; the caller commits.
 def add_articles_to_db(articles, conn):
-    c = conn.cursor()
-    new_articles = 0
-    for article in articles:
-        c.execute("SELECT * FROM articles WHERE link=?", (article['Link'],))
-        if c.fetchone() is None:
-            c.execute("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?)",
-                      (article['Title'], article['Company Name'], article['Published Date'],
-                       article['Link'], article['Summary'], article['Found Keywords']))
-            new_articles += 1
-    conn.commit()
-    return new_articles
+    with metrics.timer('db_insert_seconds', table='wayback_articles'):
+        cursor = conn.executemany(INSERT_ARTICLE, map(article_row, articles))
+    added = cursor.rowcount  # Rows inserted by the statement itself, not by the index triggers
+    metrics.inc('db_rows_inserted_total', added, table='wayback_articles')
+    return added
 
-# Main execution
-start_date = datetime(2024, 9, 1)  # Adjust this to your desired start date
-end_date = datetime(2024, 9, 5)  # Adjust this to your desired end date
+def main(start_date=None, end_date=None):
+    start_date = start_date or datetime(2024, 9, 1)  # Adjust this to your desired start date
+    end_date = end_date or datetime(2024, 9, 5)  # Adjust this to your desired end date
 
-conn = setup_database()
-new_articles = get_historical_feeds(start_date, end_date, conn)
+    conn = setup_database()
+    company_extractor.use_known_companies()
+    with ParsePool(PARSE_WORKERS) as pool:
+        new_articles = get_historical_feeds(start_date, end_date, conn, pool)
 
-c = conn.cursor()
-c.execute("SELECT COUNT(*) FROM articles")
-total_articles = c.fetchone()[0]
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM articles")
+    total_articles = c.fetchone()[0]
 
-print(f"New articles added: {new_articles}")
-print(f"Total articles in database: {total_articles}")
+    log.info("New articles added: %d", new_articles)
+    log.info("Total articles in database: %d", total_articles)
 
-# Export to CSV
-csv_file = "historical_funding_articles.csv"
-c.execute("SELECT * FROM articles")
-articles = c.fetchall()
+    # Export to CSV, streaming rows from the cursor instead of loading the whole table
+    csv_file = "historical_funding_articles.csv"
+    sink = CSVSink(csv_file, ARTICLE_FIELDS, append=False)
+    for row in c.execute(f"SELECT {ARTICLE_COLUMNS} FROM articles"):
+        sink.write(row)
+    sink.close()
 
-with open(csv_file, "w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Title", "Company Name", "Published Date", "Link", "Summary", "Found Keywords"])
-    writer.writerows(articles)
+    log.info("Data has been successfully written to %s", csv_file)
 
-print(f"Data has been successfully written to {csv_file}")
+    conn.close()
 
-conn.close()
\ No newline at end of file
+if __name__ == '__main__':
+    with instrumented_run():
+        main()
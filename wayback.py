@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import NamedTuple
+
+from retry import fetch_with_retry
+
+log = logging.getLogger(__name__)
+
+# Base URL of the archive; point it at a local fake archive server for testing
+ARCHIVE_BASE = "https://web.archive.org"
+DEFAULT_CHECKPOINT_FILE = "wayback_checkpoint.json"
+
+
+# One archived capture from the CDX index
+class Snapshot(NamedTuple):
+    timestamp: str
+    original: str
+    digest: str
+
+    @property
+    def day(self):
+        return self.timestamp[:8]
+
+    # URL of the raw archived content ("id_" skips the Wayback toolbar rewriting)
+    def archive_url(self, archive_base=ARCHIVE_BASE):
+        return f"{archive_base}/web/{self.timestamp}id_/{self.original}"
+
+
+# Function to list the first successful capture of each day in a date range with a
+# single CDX query, instead of one availability lookup per day
+def list_daily_snapshots(session, url, start_date, end_date, archive_base=ARCHIVE_BASE):
+    params = {
+        'url': url,
+        'from': start_date.strftime("%Y%m%d"),
+        'to': end_date.strftime("%Y%m%d"),
+        'output': 'json',
+        'fl': 'timestamp,original,digest',
+        'filter': 'statuscode:200',
+        'collapse': 'timestamp:8',  # One capture per day
+    }
+    response = fetch_with_retry(f"{archive_base}/cdx/search/cdx", session, params=params)
+    if not response:
+        return []
+    rows = response.json() if response.content.strip() else []
+    # The first row is the field-name header
+    return [Snapshot(*row) for row in rows[1:]]
+
+
+# Set of days already backfilled for a feed, persisted as JSON so an interrupted
+# backfill resumes where it stopped
+class BackfillCheckpoint:
+    def __init__(self, feed_url, path=DEFAULT_CHECKPOINT_FILE):
+        self.feed_url = feed_url
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+        self.completed = set(self.state.get(feed_url, []))
+
+    def is_done(self, day):
+        return day in self.completed
+
+    def mark_done(self, days):
+        self.completed.update(days)
+        self.state[self.feed_url] = sorted(self.completed)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.path)
+
+
+# Function to download the distinct snapshots of a feed for a date range.
+# Days already in the checkpoint are skipped, captures with identical content
+# digests are downloaded once, and the downloads run concurrently through the
+# fetcher's rate limiter. Yields (snapshot, days, response) for each distinct snapshot,
+# where days lists every day whose capture had that content; the caller marks those
+# days done in the checkpoint once it has stored the results. Digests for which
+# skip_digest returns True (content already ingested by an earlier run) are not
+# downloaded at all and their days are marked done straight away.
+def backfill_snapshots(fetcher, feed_url, start_date, end_date, checkpoint, archive_base=ARCHIVE_BASE,
+                       skip_digest=None):
+    snapshots = list_daily_snapshots(fetcher.session, feed_url, start_date, end_date, archive_base)
+    days_by_digest = defaultdict(list)
+    snapshot_by_digest = {}
+    for snapshot in snapshots:
+        if checkpoint.is_done(snapshot.day):
+            continue
+        days_by_digest[snapshot.digest].append(snapshot.day)
+        snapshot_by_digest.setdefault(snapshot.digest, snapshot)
+
+    if skip_digest is not None:
+        for digest in [digest for digest in snapshot_by_digest if skip_digest(digest)]:
+            del snapshot_by_digest[digest]
+            checkpoint.mark_done(days_by_digest.pop(digest))
+
+    log.info("Found %d daily snapshots, %d distinct to download.", len(snapshots), len(snapshot_by_digest))
+    digest_by_url = {snapshot.archive_url(archive_base): digest for digest, snapshot in snapshot_by_digest.items()}
+    for url, response in fetcher.fetch_all(digest_by_url):
+        if response:
+            digest = digest_by_url[url]
+            yield snapshot_by_digest[digest], days_by_digest[digest], response